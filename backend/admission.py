@@ -0,0 +1,187 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from constants import ADMISSION_CONFIG, ERROR_MESSAGES
+from metrics import metrics
+
+class Overloaded(Exception):
+    """Work that cannot be queued now; retry_after is a hint in seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def render_cost(days, formats):
+    """Relative cost of rendering days of a station's data in the given formats."""
+    return days * sum(ADMISSION_CONFIG['COST_WEIGHTS']['RENDER_DAY'][fmt] for fmt in formats)
+
+def estimate_cost(days, formats=(), resolution='daily', uncached_days=None):
+    """Relative cost of fetching, aggregating and rendering days of a station's data, in weighted rows."""
+    weights = ADMISSION_CONFIG['COST_WEIGHTS']
+    uncached_days = days if uncached_days is None else uncached_days
+    rows = weights['ROWS_PER_DAY'][resolution]
+    fetch = rows * ((days - uncached_days) * weights['CACHED_ROW'] + uncached_days * weights['UNCACHED_ROW'])
+    return fetch + render_cost(days, formats)
+
+def cost_class(cost, classes=ADMISSION_CONFIG['COST_CLASSES']):
+    for name, (max_cost, _, _) in classes.items():
+        if max_cost is None or cost <= max_cost:
+            return name
+    return name
+
+def decrement(counts, key):
+    counts[key] -= 1
+    if not counts[key]:
+        del counts[key]
+
+class Ticket:
+    def __init__(self, seq, client, cost_class):
+        self.seq = seq
+        self.client = client
+        self.cost_class = cost_class
+
+class AdmissionController:
+    """Bounded slots for the expensive part of report pipelines, scheduled by cost class and client.
+
+    Classes are served in COST_CLASSES order and each has its own cap on
+    concurrent runs, and the caps of the costlier classes leave at least
+    one slot free for the cheapest, so heavy reports queue behind cheap
+    ones and never hold every slot. Within a class the client with the fewest runs in
+    progress, then the one served least recently, goes next. When a
+    class queue or a client's share of it is full, new work is refused
+    with Overloaded rather than piling up threads and memory.
+    """
+
+    def __init__(self, slots=ADMISSION_CONFIG['SLOTS'], classes=ADMISSION_CONFIG['COST_CLASSES'],
+                 max_queued_per_client=ADMISSION_CONFIG['MAX_QUEUED_PER_CLIENT']):
+        names = list(classes)
+        others = sum(max_running for _, max_running, _ in list(classes.values())[1:])
+        if others >= slots:
+            raise ValueError(ERROR_MESSAGES['ADMISSION']['NO_RESERVED_SLOT'].format(names[0], others, slots))
+        self.slots = slots
+        self.classes = dict(classes)
+        self.max_queued_per_client = max_queued_per_client
+        self._local = threading.local()
+        self._after_fork()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._cond = threading.Condition()
+        self._queue = []
+        self._running = {}
+        self._client_running = {}
+        self._client_queued = {}
+        self._client_served = {}
+        self._seq = 0
+        self._starts = 0
+        self._run_seconds = dict.fromkeys(self.classes, ADMISSION_CONFIG['INITIAL_RUN_SECONDS'])
+
+    def set_client(self, client, wait_seconds=ADMISSION_CONFIG['MAX_WAIT_SECONDS']):
+        """Attribute slots taken on this thread to client; wait_seconds None waits as long as it takes."""
+        self._local.client = (client, wait_seconds)
+
+    def remaining_wait(self):
+        """What is left of the wait budget of the slot this thread holds; None waits as long as it takes."""
+        deadline = getattr(self._local, 'deadline', None)
+        return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+    def queued(self, name):
+        with self._cond:
+            return sum(1 for ticket in self._queue if ticket.cost_class == name)
+
+    def running(self, name):
+        with self._cond:
+            return self._running.get(name, 0)
+
+    def retry_after(self, name=None):
+        """Seconds until a run of class name (default: the slowest class) could plausibly start."""
+        with self._cond:
+            names = [name] if name else list(self.classes)
+            return max(self._retry_after(n) for n in names)
+
+    def _retry_after(self, name):
+        ahead = sum(1 for ticket in self._queue if ticket.cost_class == name) + self._running.get(name, 0)
+        return max(1, math.ceil(self._run_seconds[name] * ahead / self.classes[name][1]))
+
+    def _reject(self, name, message):
+        metrics.inc('weather_admission_rejections_total', cost_class=name)
+        return Overloaded(message, self._retry_after(name))
+
+    def check(self, cost, client):
+        """Raise Overloaded if a run of this cost from client could not be queued now."""
+        with self._cond:
+            self._check(cost_class(cost, self.classes), client)
+
+    def _check(self, name, client):
+        if sum(1 for ticket in self._queue if ticket.cost_class == name) >= self.classes[name][2]:
+            raise self._reject(name, ERROR_MESSAGES['ADMISSION']['QUEUE_FULL'].format(name))
+        if self._client_queued.get(client, 0) >= self.max_queued_per_client:
+            raise self._reject(name, ERROR_MESSAGES['ADMISSION']['CLIENT_LIMIT'])
+
+    def _next(self):
+        if sum(self._running.values()) >= self.slots:
+            return None
+        for name, (_, max_running, _) in self.classes.items():
+            if self._running.get(name, 0) >= max_running:
+                continue
+            waiting = [ticket for ticket in self._queue if ticket.cost_class == name]
+            if waiting:
+                return min(waiting, key=lambda ticket: (
+                    self._client_running.get(ticket.client, 0), self._client_served.get(ticket.client, 0), ticket.seq
+                ))
+        return None
+
+    @contextmanager
+    def slot(self, cost):
+        """Hold a slot for work of the given cost, queueing until it is this work's turn."""
+        if not ADMISSION_CONFIG['ENABLED']:
+            yield None
+            return
+
+        client, wait_seconds = getattr(self._local, 'client', None) or ('anonymous', ADMISSION_CONFIG['MAX_WAIT_SECONDS'])
+        name = cost_class(cost, self.classes)
+        start = time.perf_counter()
+        with self._cond:
+            if wait_seconds is not None:
+                self._check(name, client)
+            self._seq += 1
+            ticket = Ticket(self._seq, client, name)
+            self._queue.append(ticket)
+            self._client_queued[client] = self._client_queued.get(client, 0) + 1
+            deadline = None if wait_seconds is None else time.monotonic() + wait_seconds
+            try:
+                while self._next() is not ticket:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise self._reject(name, ERROR_MESSAGES['ADMISSION']['TIMED_OUT'])
+                    self._cond.wait(remaining)
+            finally:
+                self._queue.remove(ticket)
+                decrement(self._client_queued, client)
+                # Another waiter may be next now, whether this one runs or gave up.
+                self._cond.notify_all()
+            self._running[name] = self._running.get(name, 0) + 1
+            self._client_running[client] = self._client_running.get(client, 0) + 1
+            self._starts += 1
+            self._client_served[client] = self._starts
+        metrics.observe('weather_admission_wait_seconds', time.perf_counter() - start, cost_class=name)
+
+        start = time.perf_counter()
+        outer_deadline = getattr(self._local, 'deadline', None)
+        self._local.deadline = deadline
+        try:
+            yield name
+        finally:
+            self._local.deadline = outer_deadline
+            elapsed = time.perf_counter() - start
+            with self._cond:
+                decrement(self._running, name)
+                decrement(self._client_running, client)
+                if client not in self._client_running and client not in self._client_queued:
+                    self._client_served.pop(client, None)
+                self._run_seconds[name] += 0.2 * (elapsed - self._run_seconds[name])
+                self._cond.notify_all()
+
+admission_controller = AdmissionController()
@@ -1,24 +1,49 @@
-from flask import Flask, request, jsonify, send_from_directory, send_file
+from flask import Flask, request, jsonify, send_from_directory, send_file, Response
 from datetime import datetime, timedelta
-from meteostat import Stations, Daily, Hourly
-from geopy.geocoders import Nominatim
+from meteostat import Daily
 import pandas as pd
 import os
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_pdf import PdfPages
+import uuid
+import logging
+import importlib
+from itertools import chain
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
 from flask_cors import CORS
 from utils import normalize_request_data
-import io
-import uuid
-from threading import Timer
+from thresholds import (
+    DEFAULT_RULES, DEFAULT_HOURLY_RULES, compute_threshold_summaries, compute_grouped_threshold_summaries,
+    aggregate_hourly
+)
+from hourly import HOURLY_COLUMNS, hourly_chunks
+from rules import RESOLUTIONS, parse_rules
+from daily_cache import DAILY_COLUMNS, daily_cache
+from climatology import climatology_store
+from station_index import station_index
+from observations import current_weather_service
+from geocoding import geocoding_service
+from jobs import job_manager
+from admission import Overloaded, admission_controller, estimate_cost, render_cost
+from reports import (
+    RENDER_MODULES, render_reports, render_batch_reports, report_cache_key, build_excel_report, build_pdf_report
+)
+from exports import SERIES_FORMATS, series_stream, table_payload
+from storage import FileStorage
+from metrics import metrics
 from constants import (
-    API_CONFIG, DATE_FORMATS, WEATHER_THRESHOLDS, FILE_CONFIG, 
-    ERROR_MESSAGES, MONTH_MAPPING, APP_METADATA, DEFAULTS, PERFORMANCE_CONFIG
+    API_CONFIG, DATE_FORMATS, FILE_CONFIG,
+    ERROR_MESSAGES, APP_METADATA, DEFAULTS, PERFORMANCE_CONFIG, CACHE_CONFIG,
+    BATCH_CONFIG, EXPORT_CONFIG, CURRENT_WEATHER_CONFIG, ADMISSION_CONFIG
 )
 
 app = Flask(__name__)
 CORS(app)
 
+REPORT_EXTENSIONS = {
+    'excel': FILE_CONFIG['EXCEL_EXTENSION'],
+    'pdf': FILE_CONFIG['PDF_EXTENSION']
+}
+
 def safe_float_convert(value, default=0):
     if pd.isna(value) or value is None:
         return default
@@ -27,45 +52,72 @@ def safe_float_convert(value, default=0):
     except (ValueError, TypeError):
         return default
 
-class FileStorage:
-    def __init__(self):
-        self.files = {}
-        self.metadata = {}
-        self.expiry = {}
-        
-    def store(self, data, file_type, location_name=None):
-        file_id = str(uuid.uuid4())
-        self.files[file_id] = data
-        self.metadata[file_id] = {
-            'file_type': file_type,
-            'location_name': location_name
-        }
-        self.expiry[file_id] = datetime.now() + timedelta(minutes=API_CONFIG['FILE_EXPIRY_MINUTES'])
-        
-        Timer(API_CONFIG['FILE_EXPIRY_SECONDS'], self.remove, args=[file_id]).start()
-        return file_id
-        
-    def get(self, file_id):
-        if file_id in self.files and datetime.now() < self.expiry[file_id]:
-            data = self.files[file_id]
-            metadata = self.metadata[file_id]
-            self.remove(file_id)
-            return data, metadata
-        return None, None
-        
-    def remove(self, file_id):
-        self.files.pop(file_id, None)
-        self.metadata.pop(file_id, None)
-        self.expiry.pop(file_id, None)
-
 file_storage = FileStorage()
+if CACHE_CONFIG['STATION_INDEX_BACKGROUND_REFRESH']:
+    station_index.start()
+
+metrics.gauge('weather_report_storage_bytes', 'Report artifact bytes held in memory or spilled to disk',
+              lambda: file_storage.memory_bytes, tier='memory')
+metrics.gauge('weather_report_storage_bytes', 'Report artifact bytes held in memory or spilled to disk',
+              lambda: file_storage.total_bytes - file_storage.memory_bytes, tier='disk')
+metrics.gauge('weather_report_storage_files', 'Report artifacts in the store', lambda: len(file_storage.files))
+for status in ('queued', 'running'):
+    metrics.gauge('weather_jobs', 'Report jobs by status', lambda status=status: job_manager.count(status), status=status)
+for cost_class in ADMISSION_CONFIG['COST_CLASSES']:
+    metrics.gauge('weather_admission_queued', 'Pipeline runs waiting for a slot by cost class',
+                  lambda cost_class=cost_class: admission_controller.queued(cost_class), cost_class=cost_class)
+    metrics.gauge('weather_admission_running', 'Pipeline runs holding a slot by cost class',
+                  lambda cost_class=cost_class: admission_controller.running(cost_class), cost_class=cost_class)
+
+def warm_up():
+    """Do once what a process's first requests would otherwise pay for.
+
+    Called in the pre-forking parent (gunicorn.conf.py), so every worker
+    inherits the render modules, matplotlib's font and text caches and
+    the station index already loaded.
+    """
+    for module in RENDER_MODULES:
+        importlib.import_module(module)
+    try:
+        station_index.snapshot()
+    except Exception:
+        logging.getLogger(__name__).exception("Station index unavailable during warm-up")
+
+    index = pd.date_range('2000-01-01', periods=31, freq='D', name='time')
+    weather_data = pd.DataFrame({column: 1.0 for column in DAILY_COLUMNS}, index=index)
+    summary, monthly_lost_days = compute_threshold_summaries(weather_data)
+    build_pdf_report(weather_data, summary, monthly_lost_days, "Warm-up", 0.0, 0.0)
+    os.remove(build_excel_report(weather_data, summary, monthly_lost_days))
+
+def client_id():
+    if ADMISSION_CONFIG['TRUST_FORWARDED_FOR']:
+        return request.access_route[0]
+    return request.remote_addr or 'anonymous'
+
+def overloaded_response(e):
+    response = jsonify({"error": str(e)})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 429
+
+@app.before_request
+def start_request_trace():
+    metrics.begin_trace()
+    admission_controller.set_client(client_id(), ADMISSION_CONFIG['MAX_WAIT_SECONDS'])
+
+@app.after_request
+def finish_request_trace(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    elapsed = metrics.finish_trace(f"{request.method} {request.path} {response.status_code}",
+                                   failed=response.status_code >= 500)
+    metrics.observe('weather_http_request_seconds', elapsed, route=route, method=request.method, status=str(response.status_code))
+    return response
 
 def get_coordinates(location_name):
     try:
-        geolocator = Nominatim(user_agent=API_CONFIG['USER_AGENT'], timeout=API_CONFIG['NOMINATIM_TIMEOUT'])
-        location = geolocator.geocode(location_name, timeout=API_CONFIG['NOMINATIM_TIMEOUT'])
-        if location:
-            return location.latitude, location.longitude
+        with metrics.stage('geocode'):
+            locations = geocoding_service.search(location_name)
+        if locations:
+            return locations[0]['lat'], locations[0]['lon']
         else:
             raise ValueError(ERROR_MESSAGES['VALIDATION']['LOCATION_NOT_FOUND'].format(location_name))
     except Exception as e:
@@ -73,227 +125,486 @@ def get_coordinates(location_name):
             raise ValueError("Service timed out")
         raise e
 
-def get_nearest_station(lat, lon):
-    stations = Stations()
-    stations = stations.nearby(lat, lon)
-    station = stations.fetch(1)
-    if not station.empty:
-        return station.index[0]
+def required_parameters(rules):
+    """Daily columns no rule in the set can be evaluated without; stations known not to report them are skipped."""
+    if rules.resolution != 'daily':
+        return ()
+    return tuple(column for column in rules.required_columns if column in DAILY_COLUMNS)
+
+def get_nearest_station(lat, lon, start_date=None, end_date=None, require=()):
+    with metrics.stage('station_lookup'):
+        nearest = station_index.nearest(lat, lon, start=start_date, end=end_date, require=require)
+    if nearest:
+        return nearest[0][0]
     else:
         raise ValueError(ERROR_MESSAGES['VALIDATION']['NO_WEATHER_STATIONS'])
 
 def fetch_weather_data(station_id, start_date, end_date):
-    data = Daily(station_id, start=start_date, end=end_date)
-    data = data.fetch()
+    with metrics.stage('fetch'):
+        if CACHE_CONFIG['DAILY_CACHE_ENABLED']:
+            data = daily_cache.get(station_id, start_date, end_date)
+        else:
+            with metrics.upstream('meteostat', 'daily'):
+                data = Daily(station_id, start=start_date, end=end_date)
+                data = data.fetch()
     if data.empty:
         raise ValueError(ERROR_MESSAGES['VALIDATION']['NO_WEATHER_DATA'])
+    if CACHE_CONFIG['CLIMATOLOGY_ENABLED']:
+        with metrics.stage('climatology_update'):
+            climatology_store.update(station_id, data, start_date, end_date)
     return data
 
+def fetch_hourly_summaries(station_id, start_date, end_date, rules=DEFAULT_HOURLY_RULES):
+    """Stream the hourly series chunk by chunk into (daily aggregates, summary, monthly_lost_days)."""
+    # Fetching and folding interleave chunk by chunk, so they are timed as one stage.
+    chunks = hourly_chunks(station_id, start_date, end_date, timezone=station_index.timezone(station_id))
+    with metrics.stage('hourly_fetch_aggregate'):
+        weather_data, summary, monthly_lost_days = aggregate_hourly(chunks, rules, start_date, end_date)
+    if weather_data.empty:
+        raise ValueError(ERROR_MESSAGES['VALIDATION']['NO_WEATHER_DATA'])
+    return weather_data, summary, monthly_lost_days
+
 def validate_date(date_text):
     try:
         return datetime.strptime(date_text, DATE_FORMATS['INPUT_FORMAT'])
     except ValueError:
         raise ValueError(ERROR_MESSAGES['VALIDATION']['INVALID_DATE_FORMAT'])
 
-def calculate_monthly_lost_days(weather_data):
-    monthly_groups = weather_data.groupby('month')
-    total_years = weather_data['year'].nunique()
-    
-    temp_thresholds = WEATHER_THRESHOLDS['TEMPERATURE']
-    precip_thresholds = WEATHER_THRESHOLDS['PRECIPITATION']
-    wind_thresholds = WEATHER_THRESHOLDS['WIND']
+def analyze_weather_data(weather_data, location_name, script_dir, lat, lon, formats=FILE_CONFIG['REPORT_FORMATS'],
+                         start_date=None, end_date=None, rules=DEFAULT_RULES):
+    weather_data['month'] = weather_data.index.month
+    weather_data['year'] = weather_data.index.year
 
-    monthly_lost_days = pd.DataFrame(index=range(1, 13))
-    
-    for threshold_name, threshold_value in [
-        (f'Max > {temp_thresholds["MAX_HIGH"]}°C', temp_thresholds['MAX_HIGH']),
-        (f'Max > {temp_thresholds["MAX_MODERATE"]}°C', temp_thresholds['MAX_MODERATE'])
-    ]:
-        monthly_lost_days[threshold_name] = monthly_groups.apply(
-            lambda x: (x['tmax'] > threshold_value).sum()
-        )
-    
-    for threshold_name, threshold_value in [
-        (f'Min < {temp_thresholds["MIN_COLD"]}°C', temp_thresholds['MIN_COLD']),
-        (f'Min < {temp_thresholds["MIN_VERY_COLD"]}°C', temp_thresholds['MIN_VERY_COLD']),
-        (f'Min < {temp_thresholds["MIN_FREEZING"]}°C', temp_thresholds['MIN_FREEZING']),
-        (f'Min < {temp_thresholds["MIN_EXTREME_COLD"]}°C', temp_thresholds['MIN_EXTREME_COLD'])
-    ]:
-        monthly_lost_days[threshold_name] = monthly_groups.apply(
-            lambda x: (x['tmin'] < threshold_value).sum()
-        )
+    with metrics.stage('aggregate'):
+        summary, monthly_lost_days = compute_threshold_summaries(weather_data, rules, start=start_date, end=end_date)
 
-    for threshold_name, threshold_value in [
-        (f'Rain > {precip_thresholds["HEAVY_RAIN"]}mm', precip_thresholds['HEAVY_RAIN']),
-        (f'Rain > {precip_thresholds["VERY_HEAVY_RAIN"]}mm', precip_thresholds['VERY_HEAVY_RAIN'])
-    ]:
-        monthly_lost_days[threshold_name] = monthly_groups.apply(
-            lambda x: (x['prcp'] > threshold_value).sum()
-        )
+    return render_reports(weather_data, summary, monthly_lost_days, location_name, lat, lon, formats)
 
-    if 'wspd' in weather_data.columns:
-        for threshold_name, threshold_value in [
-            (f'Wind > {wind_thresholds["MODERATE"]} m/s', wind_thresholds['MODERATE']),
-            (f'Wind > {wind_thresholds["HIGH"]} m/s', wind_thresholds['HIGH']),
-            (f'Wind > {wind_thresholds["VERY_HIGH"]} m/s', wind_thresholds['VERY_HIGH'])
-        ]:
-            monthly_lost_days[threshold_name] = monthly_groups.apply(
-                lambda x: (x['wspd'] > threshold_value).sum()
-            )
-    else:
-        for threshold_name in [
-            f'Wind > {wind_thresholds["MODERATE"]} m/s',
-            f'Wind > {wind_thresholds["HIGH"]} m/s',
-            f'Wind > {wind_thresholds["VERY_HIGH"]} m/s'
-        ]:
-            monthly_lost_days[threshold_name] = 0
+def pipeline_cost(station_id, start_date, end_date, formats=(), resolution='daily'):
+    """Admission cost of fetching, aggregating and rendering a station's range, crediting cached days."""
+    days = (end_date - start_date).days + 1
+    uncached_days = daily_cache.uncached_days(station_id, start_date, end_date) if resolution == 'daily' else None
+    return estimate_cost(days, formats, resolution, uncached_days)
 
-    monthly_lost_days = monthly_lost_days.fillna(0) / total_years
+def parse_report_request(data):
+    location_name = data.get('location')
+    if not location_name:
+        raise ValueError(ERROR_MESSAGES['VALIDATION']['MISSING_PARAMETERS'])
 
-    monthly_lost_days.index = monthly_lost_days.index.map(MONTH_MAPPING)
+    start_date, end_date = parse_date_range(data)
+    return location_name, start_date, end_date, parse_formats(data), parse_rule_set(data)
 
-    return monthly_lost_days
+def parse_date_range(data):
+    start_date_input = data.get('start_date')
+    end_date_input = data.get('end_date')
 
-def analyze_weather_data(weather_data, location_name, script_dir, lat, lon):
-    weather_data['month'] = weather_data.index.month
-    weather_data['year'] = weather_data.index.year
-    
-    precip_thresholds = WEATHER_THRESHOLDS['PRECIPITATION']
-    wind_thresholds = WEATHER_THRESHOLDS['WIND']
+    if not all([start_date_input, end_date_input]):
+        raise ValueError(ERROR_MESSAGES['VALIDATION']['MISSING_PARAMETERS'])
 
-    monthly_groups = weather_data.groupby('month')
-    total_years = weather_data['year'].nunique()
+    start_date = validate_date(start_date_input)
+    end_date = validate_date(end_date_input)
     
-    rain_over_5mm = monthly_groups.apply(lambda x: (x['prcp'] > precip_thresholds['LIGHT_RAIN']).sum()) / total_years
-    rain_over_10mm = monthly_groups.apply(lambda x: (x['prcp'] > precip_thresholds['MODERATE_RAIN']).sum()) / total_years
+    date_diff = (end_date - start_date).days
+    if date_diff > PERFORMANCE_CONFIG['MAX_PROCESSING_DAYS']:
+        raise ValueError(
+            f"Date range too large. Maximum allowed is {PERFORMANCE_CONFIG['MAX_PROCESSING_DAYS']} days ({PERFORMANCE_CONFIG['MAX_PROCESSING_DAYS']/365:.1f} years)."
+        )
     
-    if 'wspd' in weather_data.columns:
-        wind_over_40km = monthly_groups.apply(lambda x: (x['wspd'] > wind_thresholds['EXTREME_KMH']).sum()) / total_years
+    if date_diff <= 0:
+        raise ValueError("End date must be after start date.")
+
+    return start_date, end_date
+
+def parse_formats(data):
+    formats = data.get('formats') or FILE_CONFIG['REPORT_FORMATS']
+    if not isinstance(formats, (list, tuple)) or not set(formats) <= set(FILE_CONFIG['REPORT_FORMATS']):
+        raise ValueError(ERROR_MESSAGES['VALIDATION']['INVALID_FORMATS'])
+    return tuple(sorted(set(formats)))
+
+def parse_rule_set(data, resolutions=('daily', 'hourly')):
+    resolution = data.get('resolution') or 'daily'
+    if resolution not in resolutions:
+        raise ValueError(ERROR_MESSAGES['VALIDATION']['INVALID_RESOLUTION'].format(', '.join(resolutions)))
+
+    spec = data.get('rules')
+    if spec is None:
+        return DEFAULT_HOURLY_RULES if resolution == 'hourly' else DEFAULT_RULES
+    return parse_rules(spec, resolution)
+
+def parse_series_request(data):
+    location_name = data.get('location')
+    if not location_name:
+        raise ValueError(ERROR_MESSAGES['VALIDATION']['MISSING_PARAMETERS'])
+
+    start_date, end_date = parse_date_range(data)
+    resolution = data.get('resolution') or 'daily'
+    if resolution not in RESOLUTIONS:
+        raise ValueError(ERROR_MESSAGES['VALIDATION']['INVALID_RESOLUTION'].format(', '.join(RESOLUTIONS)))
+    fmt = data.get('format') or EXPORT_CONFIG['DEFAULT_SERIES_FORMAT']
+    if fmt not in SERIES_FORMATS:
+        raise ValueError(ERROR_MESSAGES['VALIDATION']['INVALID_SERIES_FORMAT'].format(', '.join(SERIES_FORMATS)))
+    return location_name, start_date, end_date, resolution, fmt
+
+def parse_batch_request(data):
+    locations = data.get('locations')
+    if not isinstance(locations, list) or not locations:
+        raise ValueError(ERROR_MESSAGES['VALIDATION']['INVALID_LOCATIONS'])
+    if len(locations) > BATCH_CONFIG['MAX_LOCATIONS']:
+        raise ValueError(ERROR_MESSAGES['VALIDATION']['TOO_MANY_LOCATIONS'].format(BATCH_CONFIG['MAX_LOCATIONS']))
+    for entry in locations:
+        if isinstance(entry, str) and entry.strip():
+            continue
+        if isinstance(entry, dict) and 'lat' in entry and 'lon' in entry:
+            continue
+        raise ValueError(ERROR_MESSAGES['VALIDATION']['INVALID_LOCATIONS'])
+
+    start_date, end_date = parse_date_range(data)
+    return locations, start_date, end_date, parse_formats(data), parse_rule_set(data, resolutions=('daily',))
+
+def generate_report(location_name, start_date, end_date, formats=FILE_CONFIG['REPORT_FORMATS'], progress=lambda stage: None,
+                    rules=DEFAULT_RULES):
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    progress('geocoding')
+    lat, lon = get_coordinates(location_name)
+    progress('station_lookup')
+    station_id = get_nearest_station(lat, lon, start_date, end_date, required_parameters(rules))
+
+    file_ids = {fmt: report_cache_key(station_id, start_date, end_date, fmt, location_name, rules.fingerprint) for fmt in formats}
+    missing = tuple(fmt for fmt in formats if not file_storage.contains(file_ids[fmt]))
+    for fmt in formats:
+        metrics.cache('report', fmt not in missing)
+
+    if missing:
+        def build_reports(missing, progress):
+            progress('fetching')
+            if rules.resolution == 'hourly':
+                weather_data, summary, monthly_lost_days = fetch_hourly_summaries(station_id, start_date, end_date, rules)
+                progress('analyzing')
+                reports = render_reports(weather_data, summary, monthly_lost_days, location_name, lat, lon, missing, unit='Hours')
+            else:
+                weather_data = fetch_weather_data(station_id, start_date, end_date)
+                station_index.record_parameters(station_id, weather_data)
+                progress('analyzing')
+                reports = analyze_weather_data(weather_data, location_name, script_dir, lat, lon, missing, start_date, end_date, rules)
+
+            progress('storing')
+            settled = datetime.now() - timedelta(days=CACHE_CONFIG['DAILY_FINAL_AFTER_DAYS'])
+            ttl_seconds = CACHE_CONFIG['REPORT_CACHE_TTL_SECONDS'] if end_date < settled else API_CONFIG['FILE_EXPIRY_SECONDS']
+            with metrics.stage('store'):
+                for fmt, artifact in reports.items():
+                    store = file_storage.store_file if isinstance(artifact, str) else file_storage.store
+                    store(artifact, fmt, location_name, file_id=file_ids[fmt], ttl_seconds=ttl_seconds)
+
+        # The slot is taken on the caller's own terms (a request's wait limit, a job's patience) before joining a shared build.
+        with admission_controller.slot(pipeline_cost(station_id, start_date, end_date, missing, rules.resolution)):
+            # A build that finished while this caller queued leaves nothing to do.
+            missing = tuple(fmt for fmt in missing if not file_storage.contains(file_ids[fmt]))
+            if missing:
+                job_manager.coalesce(tuple(file_ids[fmt] for fmt in missing),
+                                     lambda shared_progress: build_reports(missing, shared_progress), progress)
+
+    result = {"message": "Weather analysis complete."}
+    for fmt in formats:
+        result[f"{fmt}_report"] = f"{file_ids[fmt]}{REPORT_EXTENSIONS[fmt]}"
+    return result
+
+def fetch_summaries(station_id, start_date, end_date, rules=DEFAULT_RULES):
+    """(summary, monthly_lost_days) for a station, from the climatology store when it covers the range."""
+    if rules.resolution == 'hourly':
+        with admission_controller.slot(pipeline_cost(station_id, start_date, end_date, resolution='hourly')):
+            _, summary, monthly_lost_days = fetch_hourly_summaries(station_id, start_date, end_date, rules)
+        return summary, monthly_lost_days
+
+    if CACHE_CONFIG['CLIMATOLOGY_ENABLED']:
+        cached = climatology_store.summaries(station_id, start_date, end_date, rules)
+        metrics.cache('climatology', cached is not None)
+        if cached is not None:
+            return cached
+
+    with admission_controller.slot(pipeline_cost(station_id, start_date, end_date)):
+        weather_data = fetch_weather_data(station_id, start_date, end_date)
+        station_index.record_parameters(station_id, weather_data)
+        with metrics.stage('aggregate'):
+            return compute_threshold_summaries(weather_data, rules, start=start_date, end=end_date)
+
+def generate_summary(location_name, start_date, end_date, rules=DEFAULT_RULES):
+    """The summary and lost-days tables as JSON-ready records, without rendering a report."""
+    lat, lon = get_coordinates(location_name)
+    station_id = get_nearest_station(lat, lon, start_date, end_date, required_parameters(rules))
+    summary, monthly_lost_days = fetch_summaries(station_id, start_date, end_date, rules)
+    return {
+        "location": location_name,
+        "lat": lat,
+        "lon": lon,
+        "station_id": station_id,
+        "start_date": start_date.strftime(DATE_FORMATS['DISPLAY_FORMAT']),
+        "end_date": end_date.strftime(DATE_FORMATS['DISPLAY_FORMAT']),
+        "resolution": rules.resolution,
+        "unit": 'hours' if rules.resolution == 'hourly' else 'days',
+        "monthly_summary": table_payload(summary),
+        "lost_days": table_payload(monthly_lost_days)
+    }
+
+def series_frames(station_id, start_date, end_date, resolution):
+    """(iterable of frames, columns) for a station's raw series; hourly data is fetched lazily a chunk at a time."""
+    if resolution == 'hourly':
+        chunks = hourly_chunks(station_id, start_date, end_date)
+        first = next(chunks, None)
+        if first is None:
+            raise ValueError(ERROR_MESSAGES['VALIDATION']['NO_WEATHER_DATA'])
+        return chain([first], chunks), HOURLY_COLUMNS
+    return [fetch_weather_data(station_id, start_date, end_date)], DAILY_COLUMNS
+
+def resolve_site(entry, start_date, end_date, rules=DEFAULT_RULES):
+    """Resolve one batch entry to {name, lat, lon, station_id, error}; failures stay per-site."""
+    if isinstance(entry, str):
+        site = {"name": entry, "lat": None, "lon": None, "station_id": None, "error": None}
+    else:
+        site = {"name": None, "lat": safe_float_convert(entry['lat'], None), "lon": safe_float_convert(entry['lon'], None),
+                "station_id": None, "error": None}
+        site["name"] = entry.get('name') or f"{site['lat']}, {site['lon']}"
+    try:
+        if site['lat'] is None or site['lon'] is None:
+            if not isinstance(entry, str):
+                raise ValueError(ERROR_MESSAGES['VALIDATION']['MISSING_COORDINATES'])
+            site['lat'], site['lon'] = get_coordinates(entry)
+        site['station_id'] = get_nearest_station(site['lat'], site['lon'], start_date, end_date, required_parameters(rules))
+    except Exception as e:
+        site['error'] = str(e)
+    return site
+
+def generate_batch_report(locations, start_date, end_date, formats=FILE_CONFIG['REPORT_FORMATS'], progress=lambda stage: None,
+                          rules=DEFAULT_RULES):
+    """Build one combined report for many sites, fetching each distinct station once."""
+    progress('geocoding')
+    with ThreadPoolExecutor(max_workers=BATCH_CONFIG['RESOLVE_WORKERS']) as pool:
+        sites = list(pool.map(lambda entry: resolve_site(entry, start_date, end_date, rules), locations))
+
+    progress('fetching')
+    station_summaries = {}
+    pending = []
+    for station_id in dict.fromkeys(site['station_id'] for site in sites if site['station_id'] is not None):
+        if CACHE_CONFIG['CLIMATOLOGY_ENABLED']:
+            cached = climatology_store.summaries(station_id, start_date, end_date, rules)
+            metrics.cache('climatology', cached is not None)
+            if cached is not None:
+                station_summaries[station_id] = cached
+                continue
+        pending.append(station_id)
+
+    # Sites answered from the climatology store only need rendering; they take a slot only alongside fetches.
+    days = (end_date - start_date).days + 1
+    cost = sum(pipeline_cost(station_id, start_date, end_date, formats) for station_id in pending)
+    cost += len(station_summaries) * render_cost(days, formats)
+    with admission_controller.slot(cost) if pending else nullcontext():
+        station_data = {}
+        for station_id in pending:
+            try:
+                station_data[station_id] = fetch_weather_data(station_id, start_date, end_date)
+                station_index.record_parameters(station_id, station_data[station_id])
+            except Exception as e:
+                station_data[station_id] = e
+        for site in sites:
+            if isinstance(station_data.get(site['station_id']), Exception):
+                site['error'] = str(station_data[site['station_id']])
+        station_data = {station_id: data for station_id, data in station_data.items() if not isinstance(data, Exception)}
+        if not station_data and not station_summaries:
+            raise ValueError(ERROR_MESSAGES['VALIDATION']['NO_RESOLVED_LOCATIONS'])
+
+        progress('analyzing')
+        if station_data:
+            with metrics.stage('aggregate'):
+                station_summaries.update(compute_grouped_threshold_summaries(station_data, rules, start=start_date, end=end_date))
+        reports = render_batch_reports(sites, station_summaries, formats)
+
+    progress('storing')
+    result = {"message": "Batch weather analysis complete.", "sites": sites}
+    with metrics.stage('store'):
+        for fmt, artifact in reports.items():
+            store = file_storage.store_file if isinstance(artifact, str) else file_storage.store
+            file_id = store(artifact, fmt, "batch", file_id=str(uuid.uuid4()))
+            result[f"{fmt}_report"] = f"{file_id}{REPORT_EXTENSIONS[fmt]}"
+    return result
+
+def reverse_geocode_payload(location):
+    """Shape a reverse lookup into the API response, or None when nothing usable was found."""
+    if not location or not location['raw'].get('address'):
+        return None
+    address = location['raw']['address']
+    city = address.get('city') or address.get('town') or address.get('village')
+    country = address.get('country')
+
+    if city and country:
+        formatted_location = f"{city}, {country}"
     else:
-        wind_over_40km = pd.Series(0, index=rain_over_5mm.index)
-
-    summary = pd.DataFrame({
-        f'Rain > {precip_thresholds["LIGHT_RAIN"]}mm Days (Avg)': rain_over_5mm,
-        f'Rain > {precip_thresholds["MODERATE_RAIN"]}mm Days (Avg)': rain_over_10mm,
-        f'Wind > {wind_thresholds["EXTREME_KMH"]}km/h Days (Avg)': wind_over_40km
-    }).fillna(0)
-
-    summary.index = summary.index.map(MONTH_MAPPING)
-
-    monthly_lost_days = calculate_monthly_lost_days(weather_data)
-
-    excel_buffer = io.BytesIO()
-    with pd.ExcelWriter(excel_buffer, engine='xlsxwriter') as writer:
-        weather_data.to_excel(writer, sheet_name="Raw Data")
-        summary.to_excel(writer, sheet_name="Monthly Summary")
-        monthly_lost_days.to_excel(writer, sheet_name="Lost Days Summary")
-    excel_buffer.seek(0)
-
-    pdf_buffer = io.BytesIO()
-    with PdfPages(pdf_buffer) as pdf:
-        plt.figure(figsize=(10, 6))
-        if len(weather_data) > 1000:
-            sample_data = weather_data.iloc[::max(1, len(weather_data)//500)]
+        formatted_location = location['address']
+
+    return {
+        "location": formatted_location,
+        "raw": location['raw']
+    }
+
+def parse_points(data):
+    points = data.get('points')
+    if not isinstance(points, list) or not points:
+        raise ValueError(ERROR_MESSAGES['VALIDATION']['INVALID_POINTS'])
+    if len(points) > CURRENT_WEATHER_CONFIG['MAX_BATCH_POINTS']:
+        raise ValueError(ERROR_MESSAGES['VALIDATION']['TOO_MANY_POINTS'].format(CURRENT_WEATHER_CONFIG['MAX_BATCH_POINTS']))
+    parsed = []
+    for point in points:
+        if not isinstance(point, dict):
+            raise ValueError(ERROR_MESSAGES['VALIDATION']['INVALID_POINTS'])
+        lat = safe_float_convert(point.get('lat'), None)
+        lon = safe_float_convert(point.get('lon'), None)
+        if lat is None or lon is None:
+            raise ValueError(ERROR_MESSAGES['VALIDATION']['INVALID_POINTS'])
+        parsed.append((lat, lon))
+    return parsed
+
+def current_weather_batch(points):
+    """Current readings for many points, with one upstream fetch for all stations not already cached."""
+    results = []
+    stations = []
+    for lat, lon in points:
+        try:
+            station_id = current_weather_service.station_for(lat, lon)
+            stations.append(station_id)
+            results.append({"lat": lat, "lon": lon, "station_id": station_id})
+        except Exception as e:
+            results.append({"lat": lat, "lon": lon, "station_id": None, "error": str(e)})
+
+    observations = current_weather_service.latest(stations) if stations else {}
+    for result in results:
+        if result['station_id'] is None:
+            continue
+        latest_data = observations.get(result['station_id'])
+        if latest_data is None:
+            result['error'] = "No weather data available"
         else:
-            sample_data = weather_data
-        plt.plot(sample_data.index, sample_data['tavg'], label="Avg Temp (°C)", color='blue', linewidth=0.8)
-        plt.title(f"Temperature Trends - {location_name}")
-        plt.xlabel("Date")
-        plt.ylabel("Temperature (°C)")
-        plt.legend()
-        plt.tight_layout()
-        pdf.savefig(dpi=100)
-        plt.close()
-
-        if {'Rain > 5mm Days (Avg)', 'Rain > 10mm Days (Avg)', 'Wind > 40km/h Days (Avg)'}.issubset(summary.columns):
-            plt.figure(figsize=(12, 6))
-            bar_width = 0.25
-            months = summary.index
-            x = range(len(months))
-            plt.bar(x, summary['Rain > 5mm Days (Avg)'], width=bar_width, label="Rain > 5mm Days", color='skyblue')
-            plt.bar([i + bar_width for i in x], summary['Rain > 10mm Days (Avg)'], width=bar_width, label="Rain > 10mm Days", color='orange')
-            plt.bar([i + 2 * bar_width for i in x], summary['Wind > 40km/h Days (Avg)'], width=bar_width, label="Wind > 40km/h Days", color='green')
-            plt.title(f"Monthly Summary - {location_name}")
-            plt.xticks([i + bar_width for i in x], months, rotation=45)
-            plt.legend()
-            plt.tight_layout()
-            pdf.savefig(dpi=100)
-            plt.close()
-
-        plt.figure(figsize=(14, 8))
-        monthly_lost_days.plot(kind='bar', figsize=(14, 8))
-        plt.title(f"Lost Days Summary (Monthly Averages) - {location_name}")
-        plt.ylabel("Average Number of Days")
-        plt.xlabel("Month")
-        plt.xticks(rotation=45)
-        plt.legend(title="Thresholds", bbox_to_anchor=(1.05, 1), loc='upper left')
-        plt.tight_layout()
-        pdf.savefig(dpi=100)
-        plt.close()
-
-        plt.figure(figsize=(10, 4))
-        plt.text(0.5, 0.7, f"Weather Station Location", fontsize=16, fontweight='bold', ha='center')
-        plt.text(0.5, 0.5, f"Location: {location_name}", fontsize=12, ha='center')
-        plt.text(0.5, 0.3, f"Coordinates: {lat:.4f}°N, {lon:.4f}°E", fontsize=12, ha='center')
-        plt.text(0.5, 0.1, f"Data processed: {len(weather_data)} days", fontsize=10, ha='center', style='italic')
-        plt.xlim(0, 1)
-        plt.ylim(0, 1)
-        plt.axis('off')
-        plt.title("Location Summary")
-        plt.tight_layout()
-        pdf.savefig(dpi=100)
-        plt.close()
-        
-    pdf_buffer.seek(0)
-
-    return excel_buffer, pdf_buffer
+            result.update(current_weather_payload(latest_data))
+    return results
+
+def current_weather_payload(latest_data):
+    """Shape a station's latest hourly observation row into the API response."""
+    return {
+        "temp": round(safe_float_convert(latest_data.get('temp'), DEFAULTS['TEMPERATURE']), 1),
+        "humidity": round(safe_float_convert(latest_data.get('rhum'), DEFAULTS['HUMIDITY']), 1),
+        "precipitation": round(safe_float_convert(latest_data.get('prcp'), DEFAULTS['PRECIPITATION']), 1),
+        "wind_speed": round(safe_float_convert(latest_data.get('wspd'), DEFAULTS['WIND_SPEED']), 1),
+        "time": latest_data.name.isoformat()
+    }
 
 @app.route('/api/weather-data', methods=['POST'])
 @normalize_request_data
 def weather_data_endpoint():
-    data = request.get_json()
-    location_name = data.get('location')
-    start_date_input = data.get('start_date')
-    end_date_input = data.get('end_date')
+    try:
+        location_name, start_date, end_date, formats, rules = parse_report_request(request.get_json())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    if not all([location_name, start_date_input, end_date_input]):
-        return jsonify({"error": ERROR_MESSAGES['VALIDATION']['MISSING_PARAMETERS']}), 400
+    try:
+        return jsonify(generate_report(location_name, start_date, end_date, formats, rules=rules))
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
+@app.route('/api/weather-data/summary', methods=['POST'])
+@normalize_request_data
+def summary_endpoint():
     try:
-        start_date = validate_date(start_date_input)
-        end_date = validate_date(end_date_input)
-        
-        date_diff = (end_date - start_date).days
-        if date_diff > PERFORMANCE_CONFIG['MAX_PROCESSING_DAYS']:
-            return jsonify({
-                "error": f"Date range too large. Maximum allowed is {PERFORMANCE_CONFIG['MAX_PROCESSING_DAYS']} days ({PERFORMANCE_CONFIG['MAX_PROCESSING_DAYS']/365:.1f} years)."
-            }), 400
-        
-        if date_diff <= 0:
-            return jsonify({"error": "End date must be after start date."}), 400
-            
+        location_name, start_date, end_date, _, rules = parse_report_request(request.get_json())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        return jsonify(generate_summary(location_name, start_date, end_date, rules))
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/weather-data/series', methods=['POST'])
+@normalize_request_data
+def series_endpoint():
+    try:
+        location_name, start_date, end_date, resolution, fmt = parse_series_request(request.get_json())
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
 
-    script_dir = os.path.dirname(os.path.abspath(__file__))
     try:
         lat, lon = get_coordinates(location_name)
-        station_id = get_nearest_station(lat, lon)
-        weather_data = fetch_weather_data(station_id, start_date, end_date)
-        
-        excel_buffer, pdf_buffer = analyze_weather_data(weather_data, location_name, script_dir, lat, lon)
+        station_id = get_nearest_station(lat, lon, start_date, end_date)
+        frames, columns = series_frames(station_id, start_date, end_date, resolution)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    body, mimetype = series_stream(frames, columns, fmt)
+    return Response(body, mimetype=mimetype, headers={'X-Station-Id': station_id})
+
+@app.route('/api/jobs', methods=['POST'])
+@normalize_request_data
+def create_report_job():
+    try:
+        location_name, start_date, end_date, formats, rules = parse_report_request(request.get_json())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        client = client_id()
+        admission_controller.check(estimate_cost((end_date - start_date).days + 1, formats, rules.resolution), client)
+        job = job_manager.submit(
+            lambda job: generate_report(location_name, start_date, end_date, formats, progress=job.set_stage, rules=rules),
+            client
+        )
+    except Overloaded as e:
+        return overloaded_response(e)
+    return jsonify(job.to_dict()), 202
 
-        excel_id = file_storage.store(excel_buffer.getvalue(), 'excel', location_name)
-        pdf_id = file_storage.store(pdf_buffer.getvalue(), 'pdf', location_name)
+@app.route('/api/weather-data/batch', methods=['POST'])
+@normalize_request_data
+def batch_weather_data_endpoint():
+    try:
+        locations, start_date, end_date, formats, rules = parse_batch_request(request.get_json())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-        return jsonify({
-            "message": "Weather analysis complete.",
-            "excel_report": f"{excel_id}.xlsx",
-            "pdf_report": f"{pdf_id}.pdf"
-        })
+    try:
+        return jsonify(generate_batch_report(locations, start_date, end_date, formats, rules=rules))
+    except Overloaded as e:
+        return overloaded_response(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 422
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/jobs/batch', methods=['POST'])
+@normalize_request_data
+def create_batch_report_job():
+    try:
+        locations, start_date, end_date, formats, rules = parse_batch_request(request.get_json())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        client = client_id()
+        admission_controller.check(len(locations) * estimate_cost((end_date - start_date).days + 1), client)
+        job = job_manager.submit(
+            lambda job: generate_batch_report(locations, start_date, end_date, formats, progress=job.set_stage, rules=rules),
+            client
+        )
+    except Overloaded as e:
+        return overloaded_response(e)
+    return jsonify(job.to_dict()), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_report_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": ERROR_MESSAGES['JOBS']['NOT_FOUND']}), 404
+    return jsonify(job.to_dict())
+
 @app.route('/api/reverse-geocode', methods=['GET'])
 def reverse_geocode():
     lat = request.args.get('lat')
@@ -303,23 +614,10 @@ def reverse_geocode():
         return jsonify({"error": ERROR_MESSAGES['VALIDATION']['MISSING_COORDINATES']}), 400
         
     try:
-        geolocator = Nominatim(user_agent=API_CONFIG['USER_AGENT'], timeout=API_CONFIG['NOMINATIM_TIMEOUT'])
-        location = geolocator.reverse((float(lat), float(lon)), language='en', timeout=API_CONFIG['NOMINATIM_TIMEOUT'])
+        payload = reverse_geocode_payload(geocoding_service.reverse(float(lat), float(lon)))
         
-        if location and location.raw.get('address'):
-            address = location.raw['address']
-            city = address.get('city') or address.get('town') or address.get('village')
-            country = address.get('country')
-            
-            if city and country:
-                formatted_location = f"{city}, {country}"
-            else:
-                formatted_location = location.address
-                
-            return jsonify({
-                "location": formatted_location,
-                "raw": location.raw
-            })
+        if payload:
+            return jsonify(payload)
         else:
             return jsonify({"error": "Location not found"}), 404
             
@@ -336,20 +634,7 @@ def geocode():
         return jsonify({"error": ERROR_MESSAGES['VALIDATION']['MISSING_SEARCH_QUERY']}), 400
         
     try:
-        geolocator = Nominatim(user_agent=API_CONFIG['USER_AGENT'], timeout=API_CONFIG['NOMINATIM_TIMEOUT'])
-        locations = geolocator.geocode(query, exactly_one=False, limit=API_CONFIG['GEOCODE_RESULT_LIMIT'], timeout=API_CONFIG['NOMINATIM_TIMEOUT'])
-        
-        if locations:
-            results = []
-            for location in locations:
-                results.append({
-                    "display_name": location.address,
-                    "lat": location.latitude,
-                    "lon": location.longitude
-                })
-            return jsonify(results)
-        else:
-            return jsonify([])
+        return jsonify(geocoding_service.search(query))
             
     except Exception as e:
         if 'timeout' in str(e).lower() or 'timed out' in str(e).lower():
@@ -365,47 +650,50 @@ def current_weather():
         return jsonify({"error": ERROR_MESSAGES['VALIDATION']['MISSING_COORDINATES']}), 400
         
     try:
-        station = get_nearest_station(float(lat), float(lon))
-        end_time = datetime.now()
-        start_time = end_time - timedelta(hours=API_CONFIG['HOURLY_DATA_WINDOW_HOURS'])
-        
-        data = Hourly(station, start=start_time, end=end_time)
-        data = data.fetch()
+        station = current_weather_service.station_for(float(lat), float(lon))
+        latest_data = current_weather_service.latest([station])[station]
         
-        if data.empty:
+        if latest_data is None:
             return jsonify({"error": "No weather data available"}), 404
-            
-        latest_data = data.iloc[-1]
-        weather_info = {
-            "temp": round(safe_float_convert(latest_data.get('temp'), DEFAULTS['TEMPERATURE']), 1),
-            "humidity": round(safe_float_convert(latest_data.get('rhum'), DEFAULTS['HUMIDITY']), 1),
-            "precipitation": round(safe_float_convert(latest_data.get('prcp'), DEFAULTS['PRECIPITATION']), 1),
-            "wind_speed": round(safe_float_convert(latest_data.get('wspd'), DEFAULTS['WIND_SPEED']), 1),
-            "time": latest_data.name.isoformat()
-        }
         
-        return jsonify(weather_info)
+        return jsonify(current_weather_payload(latest_data))
             
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/current-weather/batch', methods=['POST'])
+def current_weather_batch_endpoint():
+    try:
+        points = parse_points(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        return jsonify({"results": current_weather_batch(points)})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/download/<path:filename>')
 def download_file(filename):
     try:
         file_id = filename.rsplit('.', 1)[0]
         
         if filename.endswith(FILE_CONFIG['EXCEL_EXTENSION']):
-            buffer_data, metadata = file_storage.get(file_id)
+            stream, metadata = file_storage.open(file_id)
             mimetype = FILE_CONFIG['MIME_TYPES']['EXCEL']
             file_suffix = "_weather_analysis.xlsx"
         elif filename.endswith(FILE_CONFIG['PDF_EXTENSION']):
-            buffer_data, metadata = file_storage.get(file_id)
+            stream, metadata = file_storage.open(file_id)
             mimetype = FILE_CONFIG['MIME_TYPES']['PDF']
             file_suffix = "_weather_report.pdf"
         else:
             return jsonify({"error": ERROR_MESSAGES['FILES']['INVALID_FILE_TYPE']}), 400
 
-        if buffer_data is None:
+        if stream is None:
             return jsonify({"error": ERROR_MESSAGES['FILES']['NOT_FOUND_OR_EXPIRED']}), 404
 
         if metadata and metadata.get('location_name'):
@@ -415,7 +703,7 @@ def download_file(filename):
             download_filename = f"{filename.split('.')[0]}_{datetime.now().strftime(FILE_CONFIG['DATE_FORMAT_SUFFIX'])}.{filename.split('.')[1]}"
 
         return send_file(
-            io.BytesIO(buffer_data),
+            stream,
             mimetype=mimetype,
             as_attachment=True,
             download_name=download_filename
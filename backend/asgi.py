@@ -0,0 +1,203 @@
+"""ASGI entry point: uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+Geocode, reverse-geocode and current-weather are served on the event loop,
+with pooled async HTTP to Nominatim and a concurrency limit per upstream.
+Their blocking steps (SQLite cache reads and writes, station lookups that
+may load the station index) run on the loop's default executor.
+Every other route is the Flask app, run on a thread pool so report work
+never blocks the loop. Requires asgiref, httpx and an ASGI server.
+"""
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+import httpx
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgiInstance
+from app import (
+    app as flask_app, geocoding_service, current_weather_payload, reverse_geocode_payload
+)
+from observations import current_weather_service
+from constants import API_CONFIG, ASGI_CONFIG, ERROR_MESSAGES
+from metrics import metrics
+
+wsgi_executor = ThreadPoolExecutor(max_workers=ASGI_CONFIG['WSGI_THREADS'], thread_name_prefix='wsgi')
+
+class PooledWsgiInstance(WsgiToAsgiInstance):
+    """asgiref's WSGI bridge, running each request on wsgi_executor.
+
+    The stock bridge is thread-sensitive, which funnels every Flask
+    request through a single thread.
+    """
+
+    async def run_wsgi_app(self, body):
+        run = sync_to_async(WsgiToAsgiInstance.run_wsgi_app.__wrapped__, thread_sensitive=False, executor=wsgi_executor)
+        await run(self, body)
+
+class AsyncGeocoder:
+    """Nominatim over a pooled async client, sharing the sync service's cache keys and store."""
+
+    def __init__(self, service, concurrency=ASGI_CONFIG['NOMINATIM_CONCURRENCY']):
+        self.service = service
+        self.concurrency = concurrency
+        self.client = None
+        self._semaphore = None
+        self._inflight = {}
+
+    def open(self):
+        self.client = httpx.AsyncClient(
+            base_url=API_CONFIG['NOMINATIM_URL'],
+            headers={'User-Agent': API_CONFIG['USER_AGENT']},
+            timeout=API_CONFIG['NOMINATIM_TIMEOUT'],
+            limits=httpx.Limits(
+                max_connections=ASGI_CONFIG['MAX_CONNECTIONS'],
+                max_keepalive_connections=ASGI_CONFIG['MAX_KEEPALIVE_CONNECTIONS']
+            )
+        )
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def _lookup(self, key, fetch):
+        loop = asyncio.get_running_loop()
+        hit, value = await loop.run_in_executor(None, self.service.cache.get, key)
+        metrics.cache('geocode', hit)
+        if hit:
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            async def fetch_and_store():
+                if self.client is None:
+                    self.open()
+                async with self._semaphore:
+                    value = await fetch()
+                await loop.run_in_executor(None, self.service.cache.set, key, value)
+                return value
+            task = asyncio.ensure_future(fetch_and_store())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so one disconnecting client does not cancel the lookup for the others.
+        return await asyncio.shield(task)
+
+    async def search(self, query, limit=API_CONFIG['GEOCODE_RESULT_LIMIT']):
+        async def fetch():
+            with metrics.upstream('nominatim', 'search'):
+                response = await self.client.get('/search', params={'q': query, 'format': 'json', 'limit': limit})
+                response.raise_for_status()
+            return [
+                {"display_name": item['display_name'], "lat": float(item['lat']), "lon": float(item['lon'])}
+                for item in response.json()
+            ]
+        return await self._lookup(self.service.search_key(query, limit), fetch)
+
+    async def reverse(self, lat, lon):
+        key, lat, lon = self.service.reverse_cell(lat, lon)
+
+        async def fetch():
+            with metrics.upstream('nominatim', 'reverse'):
+                response = await self.client.get('/reverse', params={
+                    'lat': lat, 'lon': lon, 'format': 'json', 'addressdetails': 1, 'accept-language': 'en'
+                })
+                response.raise_for_status()
+            raw = response.json()
+            if not raw or 'error' in raw:
+                return None
+            return {"address": raw.get('display_name'), "raw": raw}
+        return await self._lookup(key, fetch)
+
+geocoder = AsyncGeocoder(geocoding_service)
+meteostat_executor = ThreadPoolExecutor(max_workers=ASGI_CONFIG['METEOSTAT_CONCURRENCY'], thread_name_prefix='meteostat')
+
+async def send_json(send, payload, status=200):
+    body = json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            (b'access-control-allow-origin', b'*')
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+def timeout_or_error(e):
+    if isinstance(e, httpx.TimeoutException) or 'timeout' in str(e).lower() or 'timed out' in str(e).lower():
+        return {"error": "Service timed out"}, 408
+    return {"error": str(e)}, 500
+
+async def geocode(args):
+    query = args.get('q')
+    if not query:
+        return {"error": ERROR_MESSAGES['VALIDATION']['MISSING_SEARCH_QUERY']}, 400
+    try:
+        return await geocoder.search(query), 200
+    except Exception as e:
+        return timeout_or_error(e)
+
+async def reverse_geocode(args):
+    lat = args.get('lat')
+    lon = args.get('lon')
+    if not all([lat, lon]):
+        return {"error": ERROR_MESSAGES['VALIDATION']['MISSING_COORDINATES']}, 400
+    try:
+        payload = reverse_geocode_payload(await geocoder.reverse(float(lat), float(lon)))
+        if payload:
+            return payload, 200
+        return {"error": "Location not found"}, 404
+    except Exception as e:
+        return timeout_or_error(e)
+
+async def current_weather(args):
+    lat = args.get('lat')
+    lon = args.get('lon')
+    if not all([lat, lon]):
+        return {"error": ERROR_MESSAGES['VALIDATION']['MISSING_COORDINATES']}, 400
+    try:
+        loop = asyncio.get_running_loop()
+        station = await loop.run_in_executor(None, current_weather_service.station_for, float(lat), float(lon))
+        hit, latest_data = current_weather_service.cached(station)
+        if hit:
+            metrics.cache('current_weather', True)
+        else:
+            # meteostat is blocking; its pool size is the upstream concurrency limit.
+            observations = await loop.run_in_executor(meteostat_executor, current_weather_service.latest, [station])
+            latest_data = observations[station]
+        if latest_data is None:
+            return {"error": "No weather data available"}, 404
+        return current_weather_payload(latest_data), 200
+    except Exception as e:
+        return {"error": str(e)}, 500
+
+ASYNC_ROUTES = {
+    '/api/geocode': geocode,
+    '/api/reverse-geocode': reverse_geocode,
+    '/api/current-weather': current_weather
+}
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            geocoder.open()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await geocoder.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+
+    handler = ASYNC_ROUTES.get(scope.get('path')) if scope['type'] == 'http' and scope['method'] == 'GET' else None
+    if handler is None:
+        return await PooledWsgiInstance(flask_app)(scope, receive, send)
+
+    args = {key: values[0] for key, values in parse_qs(scope['query_string'].decode('latin-1')).items()}
+    payload, status = await handler(args)
+    await send_json(send, payload, status)
@@ -0,0 +1,227 @@
+"""Per-stage report pipeline timings and an HTTP load test, all offline against fixtures.
+
+Run from backend/:
+    python benchmarks/bench_pipeline.py [--repeats N] [--clients N] [--requests N]
+                                        [--output results.json]
+                                        [--baseline results.json] [--tolerance 0.25]
+
+With --baseline, exits 1 if any metric regressed by more than the tolerance
+(timings slower, throughput lower, or more errors than the baseline run).
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+RANGES = {
+    '1m': ('01-06-2019', '30-06-2019'),
+    '1y': ('01-01-2019', '31-12-2019'),
+    '10y': ('02-01-2010', '31-12-2019')  # MAX_PROCESSING_DAYS allows 3650 days
+}
+
+LOCATION = 'London, UK'
+
+# Timings below this many milliseconds are too noisy to flag as regressions.
+NOISE_FLOOR_MS = 5.0
+
+def median_ms(fn, repeats, setup=lambda: None):
+    """Median wall time of fn over repeats runs, after one untimed warm-up run."""
+    setup()
+    fn()
+    timings = []
+    for _ in range(repeats):
+        setup()
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(timings), 3)
+
+def bench_stages(app, cache_dir, repeats):
+    from thresholds import compute_threshold_summaries
+    from reports import build_excel_report, build_pdf_report
+    from daily_cache import daily_cache
+    from climatology import climatology_store
+
+    def clear_data_caches():
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        climatology_store._stations.clear()
+
+    def clear_geocode_cache():
+        app.geocoding_service.cache._entries.clear()
+
+    results = {}
+    for name, (start_text, end_text) in RANGES.items():
+        start_date, end_date = app.validate_date(start_text), app.validate_date(end_text)
+        lat, lon = app.get_coordinates(LOCATION)
+        station_id = app.get_nearest_station(lat, lon, start_date, end_date)
+        data = app.fetch_weather_data(station_id, start_date, end_date)
+        data['month'] = data.index.month
+        data['year'] = data.index.year
+        summary, lost_days = compute_threshold_summaries(data, start=start_date, end=end_date)
+
+        results[name] = {
+            'rows': len(data),
+            'geocode_ms': median_ms(lambda: app.get_coordinates(LOCATION), repeats, clear_geocode_cache),
+            'station_lookup_ms': median_ms(lambda: app.get_nearest_station(lat, lon, start_date, end_date), repeats),
+            'fetch_cold_ms': median_ms(lambda: app.fetch_weather_data(station_id, start_date, end_date), repeats, clear_data_caches),
+            'fetch_cached_ms': median_ms(lambda: daily_cache.get(station_id, start_date, end_date), repeats),
+            'aggregate_ms': median_ms(lambda: compute_threshold_summaries(data, start=start_date, end=end_date), repeats),
+            'excel_ms': median_ms(lambda: os.remove(build_excel_report(data, summary, lost_days)), repeats),
+            'pdf_ms': median_ms(lambda: build_pdf_report(data, summary, lost_days, LOCATION, lat, lon), repeats)
+        }
+        print(f"{name}: " + ', '.join(f"{key}={value}" for key, value in results[name].items()))
+    return results
+
+def load_scenario(url, payload, clients, requests):
+    """Fire requests at url from clients threads; returns throughput, latency percentiles and errors."""
+    body = json.dumps(payload).encode('utf-8') if payload is not None else None
+    headers = {'Content-Type': 'application/json'} if body is not None else {}
+
+    def call(_):
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, data=body, headers=headers), timeout=60) as response:
+                response.read()
+            ok = True
+        except Exception:
+            ok = False
+        return (time.perf_counter() - start) * 1000, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        outcomes = list(pool.map(call, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in outcomes)
+    return {
+        'rps': round(requests / elapsed, 2),
+        'p50_ms': round(latencies[len(latencies) // 2], 3),
+        'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+        'errors': sum(1 for _, ok in outcomes if not ok)
+    }
+
+def bench_http(app, clients, requests):
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+    start_text, end_text = RANGES['1y']
+    report = {'location': LOCATION, 'startDate': start_text, 'endDate': end_text}
+
+    try:
+        # The first report request builds and caches the artifacts; the load test measures cache hits.
+        load_scenario(f'{base}/api/weather-data', report, 1, 1)
+        results = {
+            'geocode': load_scenario(f'{base}/api/geocode?q=London%2C%20UK', None, clients, requests),
+            'report_cached': load_scenario(f'{base}/api/weather-data', report, clients, requests)
+        }
+    finally:
+        server.shutdown()
+    for name, metrics in results.items():
+        print(f"http {name}: " + ', '.join(f"{key}={value}" for key, value in metrics.items()))
+    return results
+
+def flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{prefix}{key}.'))
+        else:
+            flat[f'{prefix}{key}'] = value
+    return flat
+
+def regressions(current, baseline, tolerance):
+    """Return (metric, baseline, current) for every metric worse than baseline by more than tolerance."""
+    current, baseline = flatten(current), flatten(baseline)
+    found = []
+    for metric, base in baseline.items():
+        value = current.get(metric)
+        if value is None:
+            continue
+        if metric.endswith('_ms'):
+            worse = value > base * (1 + tolerance) and value > NOISE_FLOOR_MS
+        elif metric.endswith('rps'):
+            worse = value < base * (1 - tolerance)
+        elif metric.endswith('errors'):
+            worse = value > base
+        else:
+            continue
+        if worse:
+            found.append((metric, base, value))
+    return found
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds of simulated upstream latency per call')
+    parser.add_argument('--output')
+    parser.add_argument('--baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    from constants import PERFORMANCE_CONFIG
+    from fixtures import isolate, load_fixtures, install
+
+    # Render inline so stage timings measure the work rather than the process pool.
+    PERFORMANCE_CONFIG['RENDER_PROCESSES'] = 0
+    cache_dir = tempfile.mkdtemp(prefix='weather-bench-')
+    isolate(cache_dir)
+    import app
+    try:
+        install(load_fixtures(), cache_dir, args.latency)
+        results = {
+            'meta': {
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'repeats': args.repeats,
+                'clients': args.clients,
+                'requests': args.requests,
+                'latency': args.latency
+            },
+            'stages': bench_stages(app, cache_dir, args.repeats),
+            'http': bench_http(app, args.clients, args.requests)
+        }
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        found = regressions({k: v for k, v in results.items() if k != 'meta'},
+                            {k: v for k, v in baseline.items() if k != 'meta'}, args.tolerance)
+        for metric, base, value in found:
+            print(f"REGRESSION {metric}: {base} -> {value}")
+        if found:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Report PDF rendering throughput, cold (fresh templates) vs warm (reused templates).
+
+Run from backend/: python benchmarks/bench_rendering.py [years] [reports] [threads]
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_thresholds import synthetic_daily
+from thresholds import compute_threshold_summaries
+from rendering import PdfReportRenderer
+
+PAGES_PER_REPORT = 4
+
+def render_many(renderer_factory, data, summary, lost_days, reports):
+    renderer = renderer_factory()
+    for i in range(reports):
+        renderer.render(data, summary, lost_days, f"Site {i}", 51.5, -0.12)
+
+def pages_per_second(label, fn, reports):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label}: {reports * PAGES_PER_REPORT / elapsed:.1f} pages/s ({elapsed / reports * 1000:.0f} ms/report)")
+
+def main():
+    years = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    reports = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    threads = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    data = synthetic_daily(years)
+    summary, lost_days = compute_threshold_summaries(data)
+
+    pages_per_second("cold", lambda: [render_many(PdfReportRenderer, data, summary, lost_days, 1) for _ in range(reports)], reports)
+
+    shared = PdfReportRenderer()
+    pages_per_second("warm", lambda: render_many(lambda: shared, data, summary, lost_days, reports), reports)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        pages_per_second(
+            f"warm x{threads} threads",
+            lambda: list(pool.map(lambda _: render_many(lambda: shared, data, summary, lost_days, reports // threads or 1), range(threads))),
+            threads * (reports // threads or 1)
+        )
+
+if __name__ == "__main__":
+    main()
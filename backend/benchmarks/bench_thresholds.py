@@ -0,0 +1,69 @@
+"""Compare the single-pass threshold engine against the old per-threshold groupby.apply path.
+
+Run from backend/: python benchmarks/bench_thresholds.py [years]
+"""
+import os
+import sys
+import timeit
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from thresholds import THRESHOLD_TABLE, MONTHLY_SUMMARY, LOST_DAYS_SUMMARY, compute_threshold_summaries
+from constants import MONTH_MAPPING
+
+def synthetic_daily(years, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2000-01-01', periods=int(365.25 * years), freq='D')
+    data = pd.DataFrame({
+        'tavg': rng.normal(22, 8, len(index)),
+        'tmin': rng.normal(15, 8, len(index)),
+        'tmax': rng.normal(30, 8, len(index)),
+        'prcp': rng.gamma(0.6, 8, len(index)),
+        'wspd': rng.gamma(2.0, 8, len(index)),
+    }, index=index)
+    data.loc[data.sample(frac=0.05, random_state=seed).index, 'prcp'] = np.nan
+    data['month'] = data.index.month
+    data['year'] = data.index.year
+    return data
+
+def legacy_summaries(weather_data):
+    monthly_groups = weather_data.groupby('month')
+    total_years = weather_data['year'].nunique()
+    summary = pd.DataFrame({
+        label: monthly_groups.apply(
+            lambda x, c=column, o=op, v=value: ((x[c] > v) if o == '>' else (x[c] < v)).sum()
+        ) / total_years
+        for sheet, label, column, op, value in THRESHOLD_TABLE if sheet == MONTHLY_SUMMARY
+    }).fillna(0)
+    summary.index = summary.index.map(MONTH_MAPPING)
+
+    lost_days = pd.DataFrame(index=range(1, 13))
+    for sheet, label, column, op, value in THRESHOLD_TABLE:
+        if sheet == LOST_DAYS_SUMMARY:
+            lost_days[label] = monthly_groups.apply(
+                lambda x, c=column, o=op, v=value: ((x[c] > v) if o == '>' else (x[c] < v)).sum()
+            )
+    lost_days = lost_days.fillna(0) / total_years
+    lost_days.index = lost_days.index.map(MONTH_MAPPING)
+    return summary, lost_days
+
+def main():
+    years = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    data = synthetic_daily(years)
+
+    # The engine divides by observed days, so it only matches the legacy output on gap-free data.
+    complete = data.fillna(0)
+    new_summary, new_lost = compute_threshold_summaries(complete)
+    old_summary, old_lost = legacy_summaries(complete)
+    pd.testing.assert_frame_equal(new_summary, old_summary, check_dtype=False)
+    pd.testing.assert_frame_equal(new_lost, old_lost, check_dtype=False)
+
+    runs = 20
+    legacy = min(timeit.repeat(lambda: legacy_summaries(data), number=1, repeat=runs))
+    engine = min(timeit.repeat(lambda: compute_threshold_summaries(data), number=1, repeat=runs))
+    print(f"rows={len(data)} legacy={legacy * 1000:.2f}ms engine={engine * 1000:.2f}ms speedup={legacy / engine:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""Offline upstream fixtures (Nominatim, station inventory, daily series) for the benchmarks.
+
+Fixtures are read from benchmarks/fixtures/ when present, otherwise a
+seeded synthetic set is generated in memory so runs need no network.
+Record real ones once with network access:
+
+    python benchmarks/fixtures.py --record
+"""
+import json
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from daily_cache import DAILY_COLUMNS
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+LOCATIONS = {
+    'London, UK': (51.5074, -0.1278),
+    'Manila, Philippines': (14.5995, 120.9842),
+    'Denver, USA': (39.7392, -104.9903)
+}
+
+TIMEZONES = {
+    'London, UK': 'Europe/London',
+    'Manila, Philippines': 'Asia/Manila',
+    'Denver, USA': 'America/Denver'
+}
+
+SERIES_START = pd.Timestamp('2000-01-01')
+SERIES_END = pd.Timestamp('2020-12-31')
+
+class Place:
+    def __init__(self, address, latitude, longitude, raw=None):
+        self.address = address
+        self.latitude = latitude
+        self.longitude = longitude
+        self.raw = raw or {}
+
+class FixtureGeolocator:
+    """Stands in for geopy's Nominatim, answering from the fixture set."""
+
+    def __init__(self, fixtures, latency=0.0):
+        self.fixtures = fixtures
+        self.latency = latency
+
+    def geocode(self, query, exactly_one=True, limit=None, timeout=None):
+        time.sleep(self.latency)
+        matches = [
+            Place(item['display_name'], float(item['lat']), float(item['lon']))
+            for item in self.fixtures['search'].get(query, [])
+        ]
+        return matches[0] if exactly_one and matches else matches
+
+    def reverse(self, point, language=None, timeout=None):
+        time.sleep(self.latency)
+        lat, lon = point
+        name, (place_lat, place_lon) = min(
+            LOCATIONS.items(), key=lambda item: (item[1][0] - lat) ** 2 + (item[1][1] - lon) ** 2
+        )
+        raw = self.fixtures['reverse'][name]
+        return Place(raw['display_name'], place_lat, place_lon, raw)
+
+def synthetic_series(seed, start=SERIES_START, end=SERIES_END):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start, end, freq='D', name='time')
+    season = np.sin(2 * np.pi * (index.dayofyear.to_numpy() - 110) / 365.25)
+    tavg = 15 + 10 * season + rng.normal(0, 3, len(index))
+    data = pd.DataFrame(np.nan, index=index, columns=DAILY_COLUMNS)
+    data['tavg'] = tavg
+    data['tmin'] = tavg - rng.gamma(4, 1.5, len(index))
+    data['tmax'] = tavg + rng.gamma(4, 1.5, len(index))
+    data['prcp'] = np.where(rng.random(len(index)) < 0.35, rng.gamma(0.8, 8, len(index)), 0.0)
+    data['wspd'] = rng.gamma(2.5, 5, len(index))
+    data['pres'] = rng.normal(1013, 8, len(index))
+    data.loc[data.sample(frac=0.02, random_state=seed).index, ['prcp', 'wspd']] = np.nan
+    return data
+
+def synthetic_fixtures(n_stations=8000, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = [f'{i:05d}' for i in range(n_stations)]
+    inventory = pd.DataFrame({
+        'latitude': np.degrees(np.arcsin(rng.uniform(-1, 1, n_stations))),
+        'longitude': rng.uniform(-180, 180, n_stations),
+        'daily_start': SERIES_START,
+        'daily_end': SERIES_END,
+        'timezone': 'UTC'
+    }, index=pd.Index(ids, name='id'))
+
+    series = {}
+    search = {}
+    reverse = {}
+    for i, (name, (lat, lon)) in enumerate(LOCATIONS.items()):
+        station_id = f'FX{i:03d}'
+        inventory.loc[station_id] = [lat + 0.01, lon + 0.01, SERIES_START, SERIES_END, TIMEZONES[name]]
+        series[station_id] = synthetic_series(seed + i)
+        search[name] = [{"display_name": name, "lat": lat, "lon": lon}]
+        city, country = name.split(', ')
+        reverse[name] = {"display_name": name, "address": {"city": city, "country": country}}
+
+    return {"search": search, "reverse": reverse, "inventory": inventory, "series": series}
+
+def load_fixtures():
+    if not os.path.exists(os.path.join(FIXTURE_DIR, 'nominatim.json')):
+        return synthetic_fixtures()
+
+    with open(os.path.join(FIXTURE_DIR, 'nominatim.json')) as f:
+        nominatim = json.load(f)
+    inventory = pd.read_csv(os.path.join(FIXTURE_DIR, 'stations.csv.gz'), index_col='id', dtype={'id': str},
+                            parse_dates=['daily_start', 'daily_end'])
+    series = {}
+    for filename in os.listdir(os.path.join(FIXTURE_DIR, 'daily')):
+        station_id = filename.split('.')[0]
+        data = pd.read_csv(os.path.join(FIXTURE_DIR, 'daily', filename), index_col='time', parse_dates=['time'])
+        series[station_id] = data.reindex(columns=DAILY_COLUMNS)
+    return {"search": nominatim['search'], "reverse": nominatim['reverse'], "inventory": inventory, "series": series}
+
+def isolate(cache_dir):
+    """Point every on-disk cache at cache_dir and turn off the station index refresher.
+
+    Call before the first import of app, which would otherwise open the
+    real geocode database and start downloading the station inventory.
+    """
+    from constants import CACHE_CONFIG, GEOCODE_CONFIG
+
+    if 'app' in sys.modules:
+        raise RuntimeError("isolate() must run before app is imported")
+    CACHE_CONFIG['STATION_INDEX_BACKGROUND_REFRESH'] = False
+    CACHE_CONFIG['STATION_INDEX_FILE'] = os.path.join(cache_dir, 'stations.npz')
+    CACHE_CONFIG['DAILY_CACHE_DIR'] = os.path.join(cache_dir, 'daily')
+    CACHE_CONFIG['CLIMATOLOGY_DIR'] = os.path.join(cache_dir, 'climatology')
+    CACHE_CONFIG['REPORT_SPILL_DIR'] = os.path.join(cache_dir, 'reports')
+    GEOCODE_CONFIG['PERSISTENT_CACHE_FILE'] = None
+
+def install(fixtures, cache_dir, latency=0.0):
+    """Point the app's upstream clients and on-disk caches at the fixtures.
+
+    Call isolate(cache_dir) and then import app before calling this;
+    every upstream call afterwards is answered from memory, after
+    sleeping latency seconds if given.
+    """
+    import app
+    from geocoding import TTLCache
+    from station_index import StationSnapshot, station_index
+    from daily_cache import daily_cache, empty_daily_frame
+    from climatology import climatology_store
+    from constants import GEOCODE_CONFIG
+
+    app.geocoding_service.geolocator = FixtureGeolocator(fixtures, latency)
+    app.geocoding_service.cache = TTLCache(GEOCODE_CONFIG['CACHE_SIZE'], GEOCODE_CONFIG['CACHE_TTL_SECONDS'])
+
+    station_index.index_file = os.path.join(cache_dir, 'stations.npz')
+    with station_index._lock:
+        station_index._snapshot = StationSnapshot.from_inventory(fixtures['inventory'])
+
+    def fetch_fixture(station_id, start, end):
+        time.sleep(latency)
+        data = fixtures['series'].get(station_id)
+        return empty_daily_frame() if data is None else data.loc[start:end].copy()
+
+    daily_cache.fetcher = fetch_fixture
+    daily_cache.cache_dir = os.path.join(cache_dir, 'daily')
+    climatology_store.cache_dir = os.path.join(cache_dir, 'climatology')
+    climatology_store._stations.clear()
+
+def record():
+    """Capture live Nominatim and meteostat responses for LOCATIONS into FIXTURE_DIR."""
+    from geopy.geocoders import Nominatim
+    from meteostat import Daily, Stations
+    from constants import API_CONFIG
+
+    geolocator = Nominatim(user_agent=API_CONFIG['USER_AGENT'], timeout=API_CONFIG['NOMINATIM_TIMEOUT'])
+    search, reverse, station_ids = {}, {}, set()
+    inventory = Stations().fetch()[['latitude', 'longitude', 'daily_start', 'daily_end', 'timezone']].dropna()
+
+    for name, (lat, lon) in LOCATIONS.items():
+        locations = geolocator.geocode(name, exactly_one=False, limit=API_CONFIG['GEOCODE_RESULT_LIMIT']) or []
+        search[name] = [{"display_name": l.address, "lat": l.latitude, "lon": l.longitude} for l in locations]
+        reverse[name] = geolocator.reverse((lat, lon), language='en').raw
+        nearest = Stations().nearby(lat, lon).inventory('daily', (SERIES_START, SERIES_END)).fetch(1)
+        station_ids.update(nearest.index)
+        time.sleep(1)  # Nominatim usage policy
+
+    os.makedirs(os.path.join(FIXTURE_DIR, 'daily'), exist_ok=True)
+    with open(os.path.join(FIXTURE_DIR, 'nominatim.json'), 'w') as f:
+        json.dump({"search": search, "reverse": reverse}, f, indent=2)
+    inventory.to_csv(os.path.join(FIXTURE_DIR, 'stations.csv.gz'))
+    for station_id in station_ids:
+        data = Daily(station_id, SERIES_START.to_pydatetime(), SERIES_END.to_pydatetime()).fetch()
+        data.to_csv(os.path.join(FIXTURE_DIR, 'daily', f'{station_id}.csv.gz'))
+    print(f"Recorded {len(search)} locations and {len(station_ids)} stations into {FIXTURE_DIR}")
+
+if __name__ == "__main__":
+    if '--record' in sys.argv:
+        record()
+    else:
+        print(__doc__)
@@ -0,0 +1,137 @@
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from constants import CACHE_CONFIG
+from thresholds import DEFAULT_RULES, monthly_counts, calendar_months, summary_frames
+
+CLIMATOLOGY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), CACHE_CONFIG['CLIMATOLOGY_DIR'])
+
+def whole_months(start, end):
+    """First and last calendar months lying entirely inside [start, end]."""
+    start = pd.Timestamp(start).normalize()
+    end = pd.Timestamp(end).normalize()
+    first = pd.Period(start, 'M') + (0 if start.day == 1 else 1)
+    last = pd.Period(end, 'M') - (0 if end.is_month_end else 1)
+    return first, last
+
+class ClimatologyStore:
+    """Per-station exceedance and valid-day counts per (year, month, rule), per rule set.
+
+    Cells are recorded only for whole months that upstream has settled, so
+    they never change once written. A summary over a range of whole months
+    is then a sum over at most a few hundred cells instead of a scan of
+    the daily rows.
+    """
+
+    def __init__(self, cache_dir=CLIMATOLOGY_DIR, max_entries=CACHE_CONFIG['CLIMATOLOGY_MEMORY_ENTRIES']):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._stations = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, station_id, rules):
+        return os.path.join(self.cache_dir, f'{station_id}.{rules.fingerprint}.npz')
+
+    def _cells(self, station_id, rules):
+        """{(year, month): (counts, valid, rows)} for a station; callers hold the lock.
+
+        Only tables backed by a file are kept, least recently used first out,
+        so lookups for custom rule sets with nothing stored hold no memory.
+        """
+        key = (station_id, rules.fingerprint)
+        if key in self._stations:
+            self._stations.move_to_end(key)
+            return self._stations[key]
+
+        cells = {}
+        path = self._path(station_id, rules)
+        if not os.path.exists(path):
+            return cells
+        with np.load(path) as stored:
+            for (year, month), counts, valid, rows in zip(
+                stored['keys'], stored['counts'], stored['valid'], stored['rows']
+            ):
+                cells[(int(year), int(month))] = (counts, valid, int(rows))
+        self._remember(key, cells)
+        return cells
+
+    def _remember(self, key, cells):
+        self._stations[key] = cells
+        self._stations.move_to_end(key)
+        while len(self._stations) > self.max_entries:
+            self._stations.popitem(last=False)
+
+    def _save(self, station_id, rules, cells):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        keys = sorted(cells)
+        path = self._path(station_id, rules)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                keys=np.array(keys, dtype=np.int32).reshape(-1, 2),
+                counts=np.array([cells[key][0] for key in keys]).reshape(len(keys), len(rules)),
+                valid=np.array([cells[key][1] for key in keys]).reshape(len(keys), len(rules)),
+                rows=np.array([cells[key][2] for key in keys], dtype=np.int32)
+            )
+        os.replace(tmp_path, path)
+
+    def update(self, station_id, weather_data, start, end, rules=DEFAULT_RULES):
+        """Record the whole, settled months of a series fetched for [start, end]."""
+        settled = pd.Timestamp(datetime.now()).normalize() - pd.Timedelta(days=CACHE_CONFIG['DAILY_FINAL_AFTER_DAYS'])
+        first, last = whole_months(start, min(pd.Timestamp(end), settled))
+        if first > last:
+            return
+
+        with self._lock:
+            known = self._cells(station_id, rules)
+            periods = [period for period in pd.period_range(first, last, freq='M') if (period.year, period.month) not in known]
+        if not periods:
+            return
+
+        # Evaluate on the whole series so runs that cross the window edge are still seen in full.
+        matches, observed = rules.evaluate(weather_data)
+        inside = (weather_data.index >= first.start_time) & (weather_data.index <= last.end_time)
+        window = weather_data.index[inside]
+        groups = window.year.to_numpy() - first.year
+        months = window.month.to_numpy()
+        n_years = last.year - first.year + 1
+
+        counts = monthly_counts(months, matches[inside], groups, n_years)
+        valid = monthly_counts(months, observed[inside], groups, n_years)
+        rows = np.bincount(12 * groups + months - 1, minlength=12 * n_years).reshape(n_years, 12)
+
+        with self._lock:
+            cells = self._cells(station_id, rules)
+            for period in periods:
+                year, month = period.year - first.year, period.month - 1
+                cells[(period.year, period.month)] = (counts[year, month], valid[year, month], int(rows[year, month]))
+            self._save(station_id, rules, cells)
+            self._remember((station_id, rules.fingerprint), cells)
+
+    def summaries(self, station_id, start, end, rules=DEFAULT_RULES):
+        """(summary, monthly_lost_days) from stored cells, or None unless every month in range is whole and known."""
+        first, last = whole_months(start, end)
+        if first > last or first.start_time != pd.Timestamp(start).normalize() or last != pd.Period(pd.Timestamp(end), 'M'):
+            return None
+
+        with self._lock:
+            cells = self._cells(station_id, rules)
+            entries = [(period.month, cells.get((period.year, period.month))) for period in pd.period_range(first, last, freq='M')]
+        if any(entry is None for _, entry in entries):
+            return None
+
+        counts = np.zeros((12, len(rules)))
+        valid = np.zeros((12, len(rules)))
+        rows = np.zeros(12, dtype=np.int64)
+        for month, (cell_counts, cell_valid, cell_rows) in entries:
+            counts[month - 1] += cell_counts
+            valid[month - 1] += cell_valid
+            rows[month - 1] += cell_rows
+        return summary_frames(counts, valid, rows, calendar_months(start, end), rules)
+
+climatology_store = ClimatologyStore()
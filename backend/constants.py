@@ -4,15 +4,126 @@ API_CONFIG = {
     'FILE_EXPIRY_SECONDS': 300,
     'GEOCODE_RESULT_LIMIT': 5,
     'HOURLY_DATA_WINDOW_HOURS': 1,
-    'NOMINATIM_TIMEOUT': 30
+    'NOMINATIM_TIMEOUT': 30,
+    'NOMINATIM_URL': 'https://nominatim.openstreetmap.org'
 }
 
 PERFORMANCE_CONFIG = {
-    'MAX_DATA_POINTS_FOR_PLOTTING': 1000,
+    'MAX_DATA_POINTS_FOR_PLOTTING': 1000,  # min-max bucketed, so peaks survive downsampling
+    'RASTERIZE_PLOT_POINTS': 5000,    # longer lines are embedded in the PDF as images
     'PDF_DPI': 100,
+    'PDF_TEMPLATE_CACHE_SIZE': 8,     # page templates kept per render thread; custom rule sets add their own
     'ENABLE_DETAILED_ANALYSIS': True,
     'SAMPLE_LARGE_DATASETS': True,
-    'MAX_PROCESSING_DAYS': 3650
+    'MAX_PROCESSING_DAYS': 3650,
+    'RENDER_PROCESSES': 2,            # 0 renders Excel/PDF inline on the request thread
+    'EXCEL_CHUNK_ROWS': 10000
+}
+
+CACHE_CONFIG = {
+    'DAILY_CACHE_ENABLED': True,
+    'DAILY_CACHE_DIR': 'cache/daily',
+    'DAILY_FINAL_AFTER_DAYS': 7,      # recent days are refetched until upstream settles
+    'CLIMATOLOGY_ENABLED': True,
+    'CLIMATOLOGY_DIR': 'cache/climatology',  # per-station monthly threshold counts for whole settled months
+    'CLIMATOLOGY_MEMORY_ENTRIES': 1024,   # (station, rule set) cell tables kept in memory
+    'STATION_INDEX_FILE': 'cache/stations.npz',
+    'STATION_INDEX_REFRESH_HOURS': 24,
+    'STATION_INDEX_BACKGROUND_REFRESH': True,  # False leaves loading to the first lookup (benchmarks, tools)
+    'PARAMETER_EVIDENCE_DAYS': 90,    # an all-empty parameter over this many days drops the station from lookups needing it over that span
+    'REPORT_CACHE_MAX_BYTES': 256 * 1024 * 1024,
+    'REPORT_CACHE_TTL_SECONDS': 86400,    # ranges that end in unsettled days use FILE_EXPIRY_SECONDS
+    'KEEP_REPORTS_AFTER_DOWNLOAD': True,
+    'REPORT_MEMORY_BUDGET_BYTES': 64 * 1024 * 1024,  # older artifacts spill to REPORT_SPILL_DIR beyond this
+    'REPORT_SPILL_DIR': None          # None uses a per-process directory under the system temp dir
+}
+
+GEOCODE_CONFIG = {
+    'CACHE_SIZE': 4096,
+    'CACHE_TTL_SECONDS': 86400,
+    'REVERSE_GRID_DEGREES': 0.001,    # ~100m, reverse lookups inside one cell share a result
+    'PERSISTENT_CACHE_FILE': 'cache/geocode.sqlite'  # None keeps the cache in memory only
+}
+
+JOB_CONFIG = {
+    'MAX_WORKERS': 8,                 # job threads mostly wait for an admission slot
+    'MAX_QUEUED': 64,                 # further submissions get 429
+    'JOB_TTL_SECONDS': 600            # finished jobs stay pollable this long
+}
+
+ADMISSION_CONFIG = {
+    'ENABLED': True,
+    'SLOTS': 4,                       # fetch/aggregate/render runs in progress at once, across all classes
+    # name: (max cost, max running, max queued), served in this order. The running caps of
+    # every class after the first must sum to less than SLOTS, so cheap runs always have one.
+    'COST_CLASSES': {
+        'light': (2000, 3, 64),
+        'medium': (20000, 2, 16),
+        'heavy': (None, 1, 8)         # at most one full multi-year report at a time
+    },
+    'COST_WEIGHTS': {
+        'ROWS_PER_DAY': {'daily': 1, 'hourly': 24},
+        'CACHED_ROW': 1,
+        'UNCACHED_ROW': 5,
+        'RENDER_DAY': {'excel': 2, 'pdf': 0.5}
+    },
+    'MAX_QUEUED_PER_CLIENT': 4,
+    'MAX_WAIT_SECONDS': 60,           # synchronous requests give up with 429 after waiting this long
+    'INITIAL_RUN_SECONDS': 5,         # Retry-After estimate until a class has run times to go on
+    'TRUST_FORWARDED_FOR': False      # identify clients by X-Forwarded-For behind a trusted proxy
+}
+
+HOURLY_CONFIG = {
+    'CHUNK_MONTHS': 3,                # hourly reports fetch and fold this many months at a time
+    'WORK_HOURS': (9, 17)             # [start, end) hours in the station's inventory time zone for the work-hour rule
+}
+
+RULES_CONFIG = {
+    'MAX_RULES': 40,
+    'MAX_EXPRESSION_LENGTH': 200,
+    'MAX_RUN_LENGTH': 72,             # consecutive days or hours a run rule may require
+    'CACHE_SIZE': 128                 # compiled rule sets kept for reuse
+}
+
+ASGI_CONFIG = {
+    'NOMINATIM_CONCURRENCY': 2,       # Nominatim's usage policy allows about one request per second
+    'METEOSTAT_CONCURRENCY': 8,
+    'MAX_CONNECTIONS': 20,            # pooled async HTTP connections per upstream host
+    'MAX_KEEPALIVE_CONNECTIONS': 10,
+    'WSGI_THREADS': 16                # threads running the Flask routes (reports, downloads, jobs)
+}
+
+CURRENT_WEATHER_CONFIG = {
+    'OBSERVATION_INTERVAL_MINUTES': 60,   # stations report hourly
+    'PUBLICATION_LAG_MINUTES': 10,        # an observation is cached until interval + lag after it was made
+    'RETRY_SECONDS': 600,                 # late or silent stations are refetched this often at most
+    'CACHE_SIZE': 10000,                  # stations whose latest observation is kept
+    'STATION_GRID_DEGREES': 0.01,         # ~1 km, points inside one cell share a nearest station
+    'STATION_CELL_CACHE_SIZE': 100000,
+    'MAX_BATCH_POINTS': 200
+}
+
+BATCH_CONFIG = {
+    'MAX_LOCATIONS': 50,
+    'RESOLVE_WORKERS': 4              # concurrent geocode/station lookups per batch
+}
+
+EXPORT_CONFIG = {
+    'SERIES_CHUNK_ROWS': 5000,        # rows per Arrow record batch / CSV block when streaming a series
+    'DEFAULT_SERIES_FORMAT': 'arrow'
+}
+
+SERVER_CONFIG = {
+    'BIND': '0.0.0.0:5000',
+    'WORKERS': 1,                     # reports and jobs live in worker memory; more workers need sticky routing
+    'THREADS': 16,
+    'TIMEOUT_SECONDS': 120,
+    'MAX_REQUESTS': 0                 # >0 recycles workers after this many requests; replacements fork warm
+}
+
+METRICS_CONFIG = {
+    'SLOW_REQUEST_SECONDS': 10,       # requests and jobs slower than this are logged with their stage breakdown; None disables
+    'BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)  # histogram bounds, seconds
 }
 
 DATE_FORMATS = {
@@ -50,7 +161,8 @@ FILE_CONFIG = {
         'EXCEL': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
         'PDF': 'application/pdf'
     },
-    'DATE_FORMAT_SUFFIX': '%Y%m%d'
+    'DATE_FORMAT_SUFFIX': '%Y%m%d',
+    'REPORT_FORMATS': ('excel', 'pdf')
 }
 
 ERROR_MESSAGES = {
@@ -61,11 +173,32 @@ ERROR_MESSAGES = {
         'NO_WEATHER_STATIONS': 'No weather stations found nearby. Try a different location.',
         'NO_WEATHER_DATA': 'No weather data available for the specified date range.',
         'MISSING_COORDINATES': 'Missing latitude or longitude',
-        'MISSING_SEARCH_QUERY': 'Missing search query'
+        'MISSING_SEARCH_QUERY': 'Missing search query',
+        'INVALID_FORMATS': 'Formats must be a non-empty list of: excel, pdf',
+        'INVALID_LOCATIONS': 'Locations must be a non-empty list of names or {lat, lon, name} objects',
+        'TOO_MANY_LOCATIONS': 'Too many locations. Maximum allowed per batch is {}.',
+        'INVALID_RULES': 'Rules must be a non-empty list of {label, expression} objects',
+        'TOO_MANY_RULES': 'Too many rules. Maximum allowed is {}.',
+        'INVALID_RULE': 'Invalid rule \'{}\': {}',
+        'INVALID_RESOLUTION': 'Resolution must be one of: {}',
+        'INVALID_SERIES_FORMAT': 'Series format must be one of: {}',
+        'INVALID_POINTS': 'Points must be a non-empty list of {lat, lon} objects',
+        'TOO_MANY_POINTS': 'At most {} points can be looked up at once',
+        'NO_RESOLVED_LOCATIONS': 'None of the requested locations could be resolved to a station with data.'
     },
     'FILES': {
         'NOT_FOUND_OR_EXPIRED': 'File not found or expired',
         'INVALID_FILE_TYPE': 'Invalid file type'
+    },
+    'JOBS': {
+        'NOT_FOUND': 'Job not found or expired',
+        'QUEUE_FULL': 'Too many report jobs are queued. Try again later.'
+    },
+    'ADMISSION': {
+        'QUEUE_FULL': 'The server is busy with {} reports. Try again later.',
+        'CLIENT_LIMIT': 'Too many of your requests are already queued. Try again later.',
+        'TIMED_OUT': 'Timed out waiting for capacity. Try again later.',
+        'NO_RESERVED_SLOT': 'Cost classes after \'{}\' may run {} at once, which leaves no slot of {} for it.'
     }
 }
 
@@ -0,0 +1,174 @@
+import os
+import threading
+import uuid
+from datetime import datetime
+import pandas as pd
+import pyarrow as pa
+from meteostat import Daily
+from constants import CACHE_CONFIG
+from metrics import metrics
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), CACHE_CONFIG['DAILY_CACHE_DIR'])
+
+DAILY_COLUMNS = ['tavg', 'tmin', 'tmax', 'prcp', 'snow', 'wdir', 'wspd', 'wpgt', 'pres', 'tsun']
+
+ONE_DAY = pd.Timedelta(days=1)
+
+def empty_daily_frame():
+    return pd.DataFrame(columns=DAILY_COLUMNS, index=pd.DatetimeIndex([], name='time'), dtype=float)
+
+def fetch_daily_upstream(station_id, start, end):
+    with metrics.upstream('meteostat', 'daily'):
+        data = Daily(station_id, start=start.to_pydatetime(), end=end.to_pydatetime()).fetch()
+    if data.empty:
+        return empty_daily_frame()
+    return data.reindex(columns=DAILY_COLUMNS)
+
+def missing_spans(lo, hi, coverage):
+    """Spans of [lo, hi] outside the contiguous covered span, widened to touch it."""
+    if coverage is None:
+        return [(lo, hi)]
+    covered_start, covered_end = coverage
+    spans = []
+    if lo < covered_start:
+        spans.append((lo, covered_start - ONE_DAY))
+    if hi > covered_end:
+        spans.append((covered_end + ONE_DAY, hi))
+    return spans
+
+def merge_spans(spans):
+    merged = []
+    for span_start, span_end in sorted(spans):
+        if merged and span_start <= merged[-1][1] + ONE_DAY:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], span_end))
+        else:
+            merged.append((span_start, span_end))
+    return merged
+
+class DailyCache:
+    """On-disk Arrow cache of meteostat Daily series, one file per station-year.
+
+    Each file records the contiguous date span it has fetched in its schema
+    metadata, so a request only goes upstream for the uncovered edges. Days
+    newer than DAILY_FINAL_AFTER_DAYS are never marked covered because
+    upstream still revises them.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, fetcher=fetch_daily_upstream):
+        self.cache_dir = cache_dir
+        self.fetcher = fetcher
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _station_lock(self, station_id):
+        with self._locks_guard:
+            return self._locks.setdefault(station_id, threading.Lock())
+
+    def _path(self, station_id, year):
+        return os.path.join(self.cache_dir, str(station_id), f'{year}.arrow')
+
+    def _read_year(self, station_id, year):
+        path = self._path(station_id, year)
+        if not os.path.exists(path):
+            return None, None
+        table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+        metadata = table.schema.metadata
+        coverage = (
+            pd.Timestamp(metadata[b'covered_start'].decode()),
+            pd.Timestamp(metadata[b'covered_end'].decode())
+        )
+        frame = table.to_pandas(split_blocks=True).set_index('time')
+        return frame, coverage
+
+    def _write_year(self, station_id, year, frame, coverage):
+        path = self._path(station_id, year)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        columns = {'time': pa.array(frame.index.values)}
+        for column in DAILY_COLUMNS:
+            columns[column] = pa.array(frame[column].to_numpy(dtype=float), from_pandas=False)
+        table = pa.table(columns).replace_schema_metadata({
+            'covered_start': coverage[0].isoformat(),
+            'covered_end': coverage[1].isoformat()
+        })
+
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+
+    def uncached_days(self, station_id, start, end):
+        """Days of [start, end] that get() would have to fetch upstream, read from file metadata only."""
+        start = pd.Timestamp(start).normalize()
+        end = pd.Timestamp(end).normalize()
+        days = 0
+        for year in range(start.year, end.year + 1):
+            lo = max(start, pd.Timestamp(year, 1, 1))
+            hi = min(end, pd.Timestamp(year, 12, 31))
+            path = self._path(station_id, year)
+            coverage = None
+            if os.path.exists(path):
+                metadata = pa.ipc.open_file(pa.memory_map(path)).schema.metadata
+                coverage = (pd.Timestamp(metadata[b'covered_start'].decode()), pd.Timestamp(metadata[b'covered_end'].decode()))
+            days += sum(
+                max(0, (min(gap_end, hi) - max(gap_start, lo)).days + 1) for gap_start, gap_end in missing_spans(lo, hi, coverage)
+            )
+        return days
+
+    def get(self, station_id, start, end):
+        start = pd.Timestamp(start).normalize()
+        end = pd.Timestamp(end).normalize()
+        settled = pd.Timestamp(datetime.now()).normalize() - pd.Timedelta(days=CACHE_CONFIG['DAILY_FINAL_AFTER_DAYS'])
+
+        with self._station_lock(station_id):
+            years = {}
+            gaps = []
+            for year in range(start.year, end.year + 1):
+                lo = max(start, pd.Timestamp(year, 1, 1))
+                hi = min(end, pd.Timestamp(year, 12, 31))
+                years[year] = self._read_year(station_id, year)
+                gaps.extend(missing_spans(lo, hi, years[year][1]))
+
+            gaps = merge_spans(gaps)
+            metrics.cache('daily', not gaps)
+            for gap_start, gap_end in gaps:
+                fetched = self.fetcher(station_id, gap_start, gap_end)
+                for year in range(gap_start.year, gap_end.year + 1):
+                    years[year] = self._merge_year(
+                        station_id, year, years[year], fetched,
+                        max(gap_start, pd.Timestamp(year, 1, 1)),
+                        min(gap_end, pd.Timestamp(year, 12, 31)),
+                        settled
+                    )
+
+            frames = [
+                frame.loc[max(start, pd.Timestamp(year, 1, 1)):min(end, pd.Timestamp(year, 12, 31))]
+                for year, (frame, _) in sorted(years.items())
+                if frame is not None
+            ]
+
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return empty_daily_frame()
+        return frames[0] if len(frames) == 1 else pd.concat(frames)
+
+    def _merge_year(self, station_id, year, cached, fetched, lo, hi, settled):
+        frame, coverage = cached
+        rows = fetched.loc[lo:hi]
+        if frame is not None:
+            rows = pd.concat([frame, rows])
+            rows = rows[~rows.index.duplicated(keep='last')].sort_index()
+
+        covered_end = min(hi, settled)
+        if covered_end >= lo:
+            if coverage is None:
+                coverage = (lo, covered_end)
+            else:
+                coverage = (min(coverage[0], lo), max(coverage[1], covered_end))
+
+        if coverage is not None:
+            self._write_year(station_id, year, rows, coverage)
+        return rows, coverage
+
+daily_cache = DailyCache()
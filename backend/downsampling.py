@@ -0,0 +1,38 @@
+import numpy as np
+from constants import PERFORMANCE_CONFIG
+
+def minmax_indices(values, max_points):
+    """Sorted positions of the minimum and maximum of each of max_points // 2 equal buckets.
+
+    Unlike taking every nth row, every local extreme survives, so spikes
+    stay on the chart. A bucket with no finite values keeps one NaN
+    position, so gaps in the series still break the line.
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    buckets = max(1, max_points // 2)
+    if n <= max_points:
+        return np.arange(n)
+
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = values
+    rows = padded.reshape(buckets, size)
+    finite = np.isfinite(rows)
+
+    offsets = np.arange(buckets) * size
+    lows = offsets + np.where(finite, rows, np.inf).argmin(axis=1)
+    highs = offsets + np.where(finite, rows, -np.inf).argmax(axis=1)
+    empty = ~finite.any(axis=1)
+    lows[empty] = highs[empty] = offsets[empty]
+
+    positions = np.unique(np.concatenate([lows, highs]))
+    return positions[positions < n]
+
+def plot_series(frame, column, max_points=PERFORMANCE_CONFIG['MAX_DATA_POINTS_FOR_PLOTTING']):
+    """(index, values) of frame[column] reduced to at most max_points points that keep its peaks."""
+    values = frame[column].to_numpy(dtype=float)
+    if not PERFORMANCE_CONFIG['SAMPLE_LARGE_DATASETS']:
+        return frame.index, values
+    positions = minmax_indices(values, max_points)
+    return frame.index[positions], values[positions]
@@ -0,0 +1,56 @@
+import io
+import numpy as np
+import pyarrow as pa
+from constants import EXPORT_CONFIG
+
+def table_payload(frame):
+    """{columns, rows} for a summary frame; rows are {month, <column>: value} with NaN as null.
+
+    columns keeps the rule order, which JSON object keys do not.
+    """
+    rows = []
+    for month, values in zip(frame.index, frame.to_numpy(dtype=float)):
+        row = {"month": month}
+        row.update((column, None if np.isnan(value) else round(float(value), 4)) for column, value in zip(frame.columns, values))
+        rows.append(row)
+    return {"columns": list(frame.columns), "rows": rows}
+
+def frame_chunks(frames, columns, rows=EXPORT_CONFIG['SERIES_CHUNK_ROWS']):
+    """Re-slice an iterable of time-indexed frames into chunks of at most rows rows with fixed columns."""
+    for frame in frames:
+        frame = frame.reindex(columns=columns).astype(float).rename_axis('time')
+        for start in range(0, len(frame), rows):
+            yield frame.iloc[start:start + rows]
+
+def drain(sink):
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
+
+def arrow_stream(chunks, columns):
+    """Yield an Arrow IPC stream, one record batch per chunk."""
+    schema = pa.schema([('time', pa.timestamp('ns'))] + [(column, pa.float64()) for column in columns])
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        yield drain(sink)
+        for chunk in chunks:
+            writer.write_batch(pa.RecordBatch.from_pandas(chunk.reset_index(), schema=schema, preserve_index=False))
+            yield drain(sink)
+    yield drain(sink)
+
+def csv_stream(chunks, columns):
+    """Yield CSV text: a header line, then one block of rows per chunk."""
+    yield ','.join(['time'] + list(columns)) + '\n'
+    for chunk in chunks:
+        yield chunk.to_csv(header=False, date_format='%Y-%m-%dT%H:%M:%S')
+
+SERIES_FORMATS = {
+    'arrow': (arrow_stream, 'application/vnd.apache.arrow.stream'),
+    'csv': (csv_stream, 'text/csv')
+}
+
+def series_stream(frames, columns, fmt):
+    """(generator of bytes/str, mimetype) for a series in the requested format."""
+    writer, mimetype = SERIES_FORMATS[fmt]
+    return writer(frame_chunks(frames, columns), columns), mimetype
@@ -0,0 +1,154 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from constants import API_CONFIG, GEOCODE_CONFIG
+from utils import SingleFlight
+from metrics import metrics
+
+def normalize_query(query):
+    return ' '.join(query.casefold().split())
+
+def quantize(value, grid):
+    return round(round(value / grid) * grid, 7)
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a fixed TTL.
+
+    When a SQLite path is given, entries are written through to it and
+    memory misses fall back to it, so results survive restarts.
+    """
+
+    def __init__(self, max_size, ttl_seconds, path=None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, expires REAL)')
+            self._db.execute('DELETE FROM cache WHERE expires < ?', (time.time(),))
+            self._db.commit()
+        self.path = path
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # SQLite connections and held locks must not cross a fork.
+        self._lock = threading.Lock()
+        if self._db is not None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    return True, value
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute('SELECT value, expires FROM cache WHERE key = ?', (key,)).fetchone()
+                if row and row[1] > now:
+                    value = json.loads(row[0])
+                    self._remember(key, value, row[1])
+                    return True, value
+        return False, None
+
+    def set(self, key, value):
+        expires = time.time() + self.ttl_seconds
+        with self._lock:
+            self._remember(key, value, expires)
+            if self._db is not None:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                    (key, json.dumps(value), expires)
+                )
+                self._db.commit()
+
+    def _remember(self, key, value, expires):
+        self._entries[key] = (value, expires)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+class GeocodingService:
+    """Shared Nominatim client with result caching and in-flight request coalescing."""
+
+    def __init__(self, cache, grid_degrees=GEOCODE_CONFIG['REVERSE_GRID_DEGREES']):
+        self.cache = cache
+        self.grid_degrees = grid_degrees
+        self._geolocator = None
+        self._inflight = SingleFlight()
+
+    @property
+    def geolocator(self):
+        # geopy is only imported once a lookup misses the cache.
+        if self._geolocator is None:
+            from geopy.geocoders import Nominatim
+            self._geolocator = Nominatim(user_agent=API_CONFIG['USER_AGENT'], timeout=API_CONFIG['NOMINATIM_TIMEOUT'])
+        return self._geolocator
+
+    @geolocator.setter
+    def geolocator(self, geolocator):
+        self._geolocator = geolocator
+
+    def _lookup(self, key, fetch):
+        hit, value = self.cache.get(key)
+        metrics.cache('geocode', hit)
+        if hit:
+            return value
+
+        def fetch_and_store():
+            value = fetch()
+            self.cache.set(key, value)
+            return value
+        return self._inflight.do(key, fetch_and_store)
+
+    def search_key(self, query, limit):
+        return f'search:{limit}:{normalize_query(query)}'
+
+    def reverse_cell(self, lat, lon):
+        """(cache key, lat, lon) of the grid cell containing a point."""
+        lat = quantize(lat, self.grid_degrees)
+        lon = quantize(lon, self.grid_degrees)
+        return f'reverse:{lat}:{lon}', lat, lon
+
+    def search(self, query, limit=API_CONFIG['GEOCODE_RESULT_LIMIT']):
+        """Return up to limit {display_name, lat, lon} matches, best first."""
+        def fetch():
+            with metrics.upstream('nominatim', 'search'):
+                locations = self.geolocator.geocode(
+                    query, exactly_one=False, limit=limit, timeout=API_CONFIG['NOMINATIM_TIMEOUT']
+                )
+            return [
+                {"display_name": location.address, "lat": location.latitude, "lon": location.longitude}
+                for location in locations or []
+            ]
+        return self._lookup(self.search_key(query, limit), fetch)
+
+    def reverse(self, lat, lon):
+        """Return {address, raw} for the grid cell containing (lat, lon), or None."""
+        key, lat, lon = self.reverse_cell(lat, lon)
+
+        def fetch():
+            with metrics.upstream('nominatim', 'reverse'):
+                location = self.geolocator.reverse((lat, lon), language='en', timeout=API_CONFIG['NOMINATIM_TIMEOUT'])
+            if location is None:
+                return None
+            return {"address": location.address, "raw": location.raw}
+        return self._lookup(key, fetch)
+
+def create_geocoding_service():
+    path = GEOCODE_CONFIG['PERSISTENT_CACHE_FILE']
+    if path:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+    return GeocodingService(TTLCache(GEOCODE_CONFIG['CACHE_SIZE'], GEOCODE_CONFIG['CACHE_TTL_SECONDS'], path))
+
+geocoding_service = create_geocoding_service()
@@ -0,0 +1,24 @@
+"""Pre-forked deployment: gunicorn -c gunicorn.conf.py app:app
+
+The master imports and warms the app once (see app.warm_up), then forks
+workers that share those pages copy-on-write, so a new or recycled worker
+serves its first request without paying for imports. WEB_CONCURRENCY
+overrides the worker count.
+"""
+import gc
+import os
+from constants import SERVER_CONFIG
+
+bind = os.environ.get('BIND', SERVER_CONFIG['BIND'])
+workers = int(os.environ.get('WEB_CONCURRENCY', SERVER_CONFIG['WORKERS']))
+threads = SERVER_CONFIG['THREADS']
+worker_class = 'gthread'
+timeout = SERVER_CONFIG['TIMEOUT_SECONDS']
+max_requests = SERVER_CONFIG['MAX_REQUESTS']
+preload_app = True
+
+def when_ready(server):
+    import app
+    app.warm_up()
+    # Move warmed objects out of the collector's reach so its bookkeeping does not dirty shared pages.
+    gc.freeze()
@@ -0,0 +1,52 @@
+import pandas as pd
+from meteostat import Hourly
+from constants import HOURLY_CONFIG
+from metrics import metrics
+
+HOURLY_COLUMNS = ['temp', 'dwpt', 'rhum', 'prcp', 'snow', 'wdir', 'wspd', 'wpgt', 'pres', 'tsun', 'coco']
+
+ONE_HOUR = pd.Timedelta(hours=1)
+
+def empty_hourly_frame():
+    return pd.DataFrame(columns=HOURLY_COLUMNS, index=pd.DatetimeIndex([], name='time'), dtype=float)
+
+def fetch_hourly_upstream(station_id, start, end):
+    with metrics.upstream('meteostat', 'hourly'):
+        data = Hourly(station_id, start=start.to_pydatetime(), end=end.to_pydatetime()).fetch()
+    if data.empty:
+        return empty_hourly_frame()
+    return data.reindex(columns=HOURLY_COLUMNS)
+
+def chunk_bounds(start, end, months=HOURLY_CONFIG['CHUNK_MONTHS']):
+    """Split [start, end] (whole days) into spans aligned to calendar month boundaries."""
+    start = pd.Timestamp(start).normalize()
+    stop = pd.Timestamp(end).normalize() + pd.Timedelta(days=1)
+    edges = [start]
+    edge = pd.Timestamp(start.year, start.month, 1)
+    while True:
+        edge = edge + pd.DateOffset(months=months)
+        if edge >= stop:
+            break
+        edges.append(edge)
+    edges.append(stop)
+    return [(lo, hi - ONE_HOUR) for lo, hi in zip(edges, edges[1:])]
+
+def to_utc(timestamp, timezone):
+    """Naive UTC time of a naive local wall-clock time; DST gaps shift forward."""
+    return pd.Timestamp(timestamp).tz_localize(timezone, ambiguous=True, nonexistent='shift_forward').tz_convert('UTC').tz_localize(None)
+
+def hourly_chunks(station_id, start, end, fetcher=fetch_hourly_upstream, timezone=None):
+    """Yield the hourly series for [start, end] one chunk at a time.
+
+    Upstream timestamps are UTC. With a timezone, start and end are that
+    zone's local days and the index is converted to local wall-clock time,
+    so hour and weekday rules see the station's own clock.
+    """
+    for chunk_start, chunk_end in chunk_bounds(start, end):
+        if timezone is None:
+            chunk = fetcher(station_id, chunk_start, chunk_end)
+        else:
+            chunk = fetcher(station_id, to_utc(chunk_start, timezone), to_utc(chunk_end, timezone))
+            chunk.index = chunk.index.tz_localize('UTC').tz_convert(timezone).tz_localize(None).rename('time')
+        if not chunk.empty:
+            yield chunk
@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from admission import Overloaded, admission_controller
+from constants import JOB_CONFIG, ERROR_MESSAGES
+from utils import SingleFlight
+from metrics import metrics
+
+REPORT_STAGES = ['queued', 'geocoding', 'station_lookup', 'fetching', 'analyzing', 'storing', 'complete']
+
+class Job:
+    def __init__(self, client=None):
+        self.id = str(uuid.uuid4())
+        self.client = client
+        self.status = 'queued'
+        self.stage = 'queued'
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+
+    def set_stage(self, stage):
+        self.stage = stage
+
+    def to_dict(self):
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": round(REPORT_STAGES.index(self.stage) / (len(REPORT_STAGES) - 1), 2)
+        }
+        if self.result is not None:
+            data["result"] = self.result
+        if self.error is not None:
+            data["error"] = self.error
+        return data
+
+class JobManager:
+    """Runs report pipelines on a bounded worker pool and tracks their progress.
+
+    Workers computing the same report key share one computation through
+    coalesce(), so duplicate submissions cost a single pipeline run, and
+    every one of them sees its stages.
+    Once accepted, a job waits for its admission slot as long as it
+    takes; submissions beyond max_queued are refused instead.
+    """
+
+    def __init__(self, max_workers=JOB_CONFIG['MAX_WORKERS'], ttl_seconds=JOB_CONFIG['JOB_TTL_SECONDS'],
+                 max_queued=JOB_CONFIG['MAX_QUEUED']):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.ttl_seconds = ttl_seconds
+        self.jobs = {}
+        self._after_fork()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # A forked worker gets its own threads and locks.
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='report-job')
+        self._lock = threading.Lock()
+        self._shared = SingleFlight()
+        self._watchers = {}
+
+    def submit(self, pipeline, client=None):
+        """Queue pipeline(job) and return the Job immediately; raises Overloaded if the queue is full."""
+        job = Job(client)
+        with self._lock:
+            self._prune()
+            if sum(1 for queued in self.jobs.values() if queued.status == 'queued') >= self.max_queued:
+                raise Overloaded(ERROR_MESSAGES['JOBS']['QUEUE_FULL'], admission_controller.retry_after())
+            self.jobs[job.id] = job
+        self.executor.submit(self._run, job, pipeline)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def count(self, status):
+        with self._lock:
+            return sum(1 for job in self.jobs.values() if job.status == status)
+
+    def coalesce(self, key, compute, progress=lambda stage: None):
+        """Run compute(progress) once for concurrent callers with the same key.
+
+        Call it while holding an admission slot. Each caller's progress hears
+        the shared run's stages, and a caller whose slot wait is bounded stops
+        following once that budget is spent and gets Overloaded.
+        """
+        with self._lock:
+            watchers = self._watchers.setdefault(key, {'stage': None, 'listeners': []})
+            watchers['listeners'].append(progress)
+            stage = watchers['stage']
+        if stage is not None:
+            progress(stage)
+
+        def broadcast(stage):
+            with self._lock:
+                watchers['stage'] = stage
+                listeners = list(watchers['listeners'])
+            for listener in listeners:
+                listener(stage)
+
+        try:
+            return self._shared.do(key, lambda: compute(broadcast), admission_controller.remaining_wait())
+        except FutureTimeout:
+            raise Overloaded(ERROR_MESSAGES['ADMISSION']['TIMED_OUT'], admission_controller.retry_after())
+        finally:
+            with self._lock:
+                watchers['listeners'].remove(progress)
+                if not watchers['listeners'] and self._watchers.get(key) is watchers:
+                    del self._watchers[key]
+
+    def _run(self, job, pipeline):
+        job.status = 'running'
+        metrics.begin_trace()
+        admission_controller.set_client(job.client or 'anonymous', wait_seconds=None)
+        try:
+            job.result = pipeline(job)
+            job.stage = 'complete'
+            job.status = 'complete'
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished = time.time()
+            elapsed = metrics.finish_trace(f"job {job.id}", failed=job.status == 'failed')
+            metrics.observe('weather_job_seconds', elapsed, status=job.status)
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl_seconds
+        expired = [job_id for job_id, job in self.jobs.items() if job.finished and job.finished < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+job_manager = JobManager()
@@ -0,0 +1,160 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from constants import METRICS_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Counters and histograms, with their Prometheus type and help text.
+DEFINITIONS = {
+    'weather_stage_seconds': ('histogram', 'Time spent in each report pipeline stage'),
+    'weather_stage_errors_total': ('counter', 'Exceptions raised by report pipeline stages, by exception type'),
+    'weather_cache_requests_total': ('counter', 'Cache lookups by cache and result'),
+    'weather_upstream_requests_total': ('counter', 'Calls to upstream services by result'),
+    'weather_upstream_seconds': ('histogram', 'Upstream call latency'),
+    'weather_http_request_seconds': ('histogram', 'HTTP request latency by route, method and status'),
+    'weather_job_seconds': ('histogram', 'Report job run time by outcome'),
+    'weather_admission_wait_seconds': ('histogram', 'Time spent queued for a pipeline slot by cost class'),
+    'weather_admission_rejections_total': ('counter', 'Requests refused with 429 by cost class')
+}
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in labels) + '}'
+
+def format_number(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Metrics:
+    """Thread-safe counters, histograms and callback gauges, rendered in Prometheus text format.
+
+    Stage spans also go to a per-thread trace, so a slow request or job
+    can be logged with the time each stage took.
+    """
+
+    def __init__(self, buckets=METRICS_CONFIG['BUCKETS'], slow_seconds=METRICS_CONFIG['SLOW_REQUEST_SECONDS']):
+        self.buckets = tuple(buckets)
+        self.slow_seconds = slow_seconds
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def gauge(self, name, help_text, fn, **labels):
+        """Register fn() as the value of a gauge series, read at scrape time."""
+        with self._lock:
+            self._gauges.setdefault(name, (help_text, {}))[1][tuple(sorted(labels.items()))] = fn
+
+    def cache(self, cache, hit):
+        self.inc('weather_cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+    def record_stage(self, name, seconds, error=None):
+        self.observe('weather_stage_seconds', seconds, stage=name)
+        if error is not None:
+            self.inc('weather_stage_errors_total', stage=name, error=error)
+        trace = getattr(self._local, 'trace', None)
+        if trace is not None:
+            trace.append((name, seconds, error))
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.record_stage(name, time.perf_counter() - start, type(e).__name__)
+            raise
+        self.record_stage(name, time.perf_counter() - start)
+
+    @contextmanager
+    def upstream(self, service, call):
+        start = time.perf_counter()
+        result = 'error'
+        try:
+            yield
+            result = 'ok'
+        finally:
+            self.observe('weather_upstream_seconds', time.perf_counter() - start, service=service, call=call)
+            self.inc('weather_upstream_requests_total', service=service, call=call, result=result)
+
+    def begin_trace(self):
+        self._local.trace = []
+        self._local.trace_start = time.perf_counter()
+
+    def finish_trace(self, description, failed=False):
+        """End this thread's trace, logging its stage breakdown if it was slow or failed; returns seconds elapsed."""
+        trace = getattr(self._local, 'trace', None)
+        if trace is None:
+            return 0.0
+        elapsed = time.perf_counter() - self._local.trace_start
+        self._local.trace = None
+
+        slow = self.slow_seconds is not None and elapsed >= self.slow_seconds
+        if slow or failed:
+            breakdown = ' '.join(
+                f"{name}={seconds:.3f}s" + (f"({error})" if error else '') for name, seconds, error in trace
+            ) or 'no stages'
+            logger.warning("%s %s in %.3fs: %s", 'Failed' if failed else 'Slow', description, elapsed, breakdown)
+        return elapsed
+
+    def render(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(buckets), total, count) for key, (buckets, total, count) in self._histograms.items()}
+            gauges = {name: (help_text, dict(series)) for name, (help_text, series) in self._gauges.items()}
+
+        lines = []
+        for name, (kind, help_text) in DEFINITIONS.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            if kind == 'counter':
+                for (series, labels), value in sorted(counters.items()):
+                    if series == name:
+                        lines.append(f'{name}{format_labels(labels)} {format_number(value)}')
+                continue
+            for (series, labels), (buckets, total, count) in sorted(histograms.items()):
+                if series != name:
+                    continue
+                for bound, bucket_count in zip(self.buckets, buckets):
+                    lines.append(f'{name}_bucket{format_labels(labels + (("le", format_number(bound)),))} {bucket_count}')
+                lines.append(f'{name}_bucket{format_labels(labels + (("le", "+Inf"),))} {count}')
+                lines.append(f'{name}_sum{format_labels(labels)} {format_number(total)}')
+                lines.append(f'{name}_count{format_labels(labels)} {count}')
+
+        for name, (help_text, series) in sorted(gauges.items()):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+            for labels, fn in sorted(series.items(), key=lambda item: item[0]):
+                try:
+                    lines.append(f'{name}{format_labels(labels)} {format_number(fn())}')
+                except Exception:
+                    logger.exception("Gauge %s failed", name)
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
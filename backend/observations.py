@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import pandas as pd
+from meteostat import Hourly
+from constants import API_CONFIG, CACHE_CONFIG, CURRENT_WEATHER_CONFIG, ERROR_MESSAGES
+from geocoding import TTLCache, quantize
+from metrics import metrics
+from station_index import station_index
+from utils import SingleFlight
+
+def fetch_latest_observations(station_ids):
+    """{station_id: latest hourly row, or None} for the recent window, in one upstream call."""
+    end_time = datetime.now()
+    start_time = end_time - timedelta(hours=API_CONFIG['HOURLY_DATA_WINDOW_HOURS'])
+    with metrics.upstream('meteostat', 'hourly'):
+        data = Hourly(list(station_ids), start=start_time, end=end_time).fetch()
+
+    latest = dict.fromkeys(station_ids)
+    if data.empty:
+        return latest
+    if 'station' not in data.index.names:
+        data = pd.concat({station_ids[0]: data}, names=['station'])
+    for station_id, rows in data.groupby(level='station'):
+        latest[station_id] = rows.droplevel('station').iloc[-1]
+    return latest
+
+class CurrentWeatherService:
+    """Latest observation per station, held until the station's next one is due.
+
+    Stations report about once an hour, so an observation made at T is
+    kept until T + OBSERVATION_INTERVAL + PUBLICATION_LAG. Stations that
+    are late or have nothing in the window are retried after
+    RETRY_SECONDS instead of on every request. Points are mapped to
+    stations through a grid-cell cache, so repeat lookups skip the
+    nearest-station search too.
+    """
+
+    def __init__(self, fetcher=fetch_latest_observations, max_stations=CURRENT_WEATHER_CONFIG['CACHE_SIZE']):
+        self.fetcher = fetcher
+        self.max_stations = max_stations
+        self.stations = TTLCache(
+            CURRENT_WEATHER_CONFIG['STATION_CELL_CACHE_SIZE'], CACHE_CONFIG['STATION_INDEX_REFRESH_HOURS'] * 3600
+        )
+        self._observations = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = SingleFlight()
+
+    def station_for(self, lat, lon):
+        grid = CURRENT_WEATHER_CONFIG['STATION_GRID_DEGREES']
+        key = f'{quantize(lat, grid)}:{quantize(lon, grid)}'
+        hit, station_id = self.stations.get(key)
+        metrics.cache('current_station', hit)
+        if not hit:
+            nearest = station_index.nearest(lat, lon)
+            if not nearest:
+                raise ValueError(ERROR_MESSAGES['VALIDATION']['NO_WEATHER_STATIONS'])
+            station_id = nearest[0][0]
+            self.stations.set(key, station_id)
+        return station_id
+
+    def expires(self, row, now):
+        if row is not None:
+            observed = pd.Timestamp(row.name).tz_localize('UTC').timestamp()
+            due = observed + 60 * (
+                CURRENT_WEATHER_CONFIG['OBSERVATION_INTERVAL_MINUTES'] + CURRENT_WEATHER_CONFIG['PUBLICATION_LAG_MINUTES']
+            )
+            if due > now:
+                return due
+        return now + CURRENT_WEATHER_CONFIG['RETRY_SECONDS']
+
+    def cached(self, station_id):
+        """(hit, row) from the cache alone, never fetching."""
+        with self._lock:
+            entry = self._observations.get(station_id)
+            if entry is not None and entry[1] > time.time():
+                return True, entry[0]
+        return False, None
+
+    def latest(self, station_ids):
+        """{station_id: latest observation row, or None}; stations not cached are fetched together."""
+        now = time.time()
+        result = {}
+        missing = []
+        with self._lock:
+            for station_id in dict.fromkeys(station_ids):
+                entry = self._observations.get(station_id)
+                if entry is not None and entry[1] > now:
+                    self._observations.move_to_end(station_id)
+                    result[station_id] = entry[0]
+                else:
+                    missing.append(station_id)
+                metrics.cache('current_weather', station_id in result)
+
+        if missing:
+            missing = sorted(missing)
+            result.update(self._inflight.do(tuple(missing), lambda: self._fetch(missing)))
+        return result
+
+    def _fetch(self, station_ids):
+        rows = self.fetcher(station_ids)
+        now = time.time()
+        with self._lock:
+            for station_id in station_ids:
+                self._observations[station_id] = (rows.get(station_id), self.expires(rows.get(station_id), now))
+                self._observations.move_to_end(station_id)
+            while len(self._observations) > self.max_stations:
+                self._observations.popitem(last=False)
+        return {station_id: rows.get(station_id) for station_id in station_ids}
+
+current_weather_service = CurrentWeatherService()
@@ -0,0 +1,200 @@
+import io
+import threading
+from collections import OrderedDict
+import numpy as np
+import matplotlib.dates as mdates
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+from constants import PERFORMANCE_CONFIG
+from downsampling import plot_series
+
+SUMMARY_COLORS = ['skyblue', 'orange', 'green']
+
+def new_figure(figsize):
+    figure = Figure(figsize=figsize)
+    FigureCanvasAgg(figure)
+    return figure
+
+class TemperaturePage:
+    def __init__(self):
+        self.figure = new_figure((10, 6))
+        self.ax = self.figure.add_subplot()
+        self.line, = self.ax.plot([], [], label="Avg Temp (°C)", color='blue', linewidth=0.8)
+        self.ax.xaxis_date()
+        self.ax.set_xlabel("Date")
+        self.ax.set_ylabel("Temperature (°C)")
+        self.ax.legend()
+        self.title = self.ax.set_title("")
+        self.laid_out = False
+
+    def render(self, weather_data, location_name):
+        dates, values = plot_series(weather_data, 'tavg')
+        self.line.set_data(mdates.date2num(dates), values)
+        self.line.set_rasterized(len(values) > PERFORMANCE_CONFIG['RASTERIZE_PLOT_POINTS'])
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.title.set_text(f"Temperature Trends - {location_name}")
+        return self.figure
+
+class MonthlySummaryPage:
+    group_width = 0.75
+
+    def __init__(self, columns):
+        self.figure = new_figure((12, 6))
+        self.ax = self.figure.add_subplot()
+        x = np.arange(12)
+        self.bar_width = self.group_width / len(columns)
+        self.series = [
+            self.ax.bar(x + j * self.bar_width, np.zeros(12), width=self.bar_width, label=column.replace(' (Avg)', ''),
+                        color=SUMMARY_COLORS[j] if j < len(SUMMARY_COLORS) else f'C{j % 10}')
+            for j, column in enumerate(columns)
+        ]
+        self.ax.legend()
+        self.title = self.ax.set_title("")
+        self.laid_out = False
+
+    def render(self, summary, location_name):
+        months = len(summary.index)
+        for bars, column in zip(self.series, summary.columns):
+            values = summary[column].to_numpy(dtype=float)
+            for i, bar in enumerate(bars):
+                bar.set_visible(i < months)
+                bar.set_height(values[i] if i < months else 0)
+        self.ax.set_xticks(np.arange(months) + (self.group_width - self.bar_width) / 2, summary.index, rotation=45)
+        self.ax.relim(visible_only=True)
+        self.ax.autoscale_view()
+        self.title.set_text(f"Monthly Summary - {location_name}")
+        return self.figure
+
+class LostDaysPage:
+    group_width = 0.5
+
+    def __init__(self, columns):
+        self.figure = new_figure((14, 8))
+        self.ax = self.figure.add_subplot()
+        x = np.arange(12)
+        width = self.group_width / len(columns)
+        self.series = [
+            self.ax.bar(x - self.group_width / 2 + (j + 0.5) * width, np.zeros(12), width=width,
+                        label=column, color=f'C{j % 10}')
+            for j, column in enumerate(columns)
+        ]
+        self.ax.set_xticks(x, [''] * 12, rotation=45)
+        self.ylabel = self.ax.set_ylabel("")
+        self.ax.set_xlabel("Month")
+        self.ax.legend(title="Thresholds", bbox_to_anchor=(1.05, 1), loc='upper left')
+        self.title = self.ax.set_title("")
+        self.laid_out = False
+
+    def render(self, monthly_lost_days, location_name, unit):
+        for bars, column in zip(self.series, monthly_lost_days.columns):
+            for bar, value in zip(bars, monthly_lost_days[column].to_numpy(dtype=float)):
+                bar.set_height(value)
+        self.ax.set_xticks(np.arange(12), monthly_lost_days.index, rotation=45)
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.ylabel.set_text(f"Average Number of {unit}")
+        self.title.set_text(f"Lost {unit} Summary (Monthly Averages) - {location_name}")
+        return self.figure
+
+class LocationPage:
+    def __init__(self):
+        self.figure = new_figure((10, 4))
+        self.ax = self.figure.add_subplot()
+        self.ax.text(0.5, 0.7, "Weather Station Location", fontsize=16, fontweight='bold', ha='center')
+        self.location = self.ax.text(0.5, 0.5, "", fontsize=12, ha='center')
+        self.coordinates = self.ax.text(0.5, 0.3, "", fontsize=12, ha='center')
+        self.processed = self.ax.text(0.5, 0.1, "", fontsize=10, ha='center', style='italic')
+        self.ax.set_xlim(0, 1)
+        self.ax.set_ylim(0, 1)
+        self.ax.axis('off')
+        self.ax.set_title("Location Summary")
+        self.laid_out = False
+
+    def render(self, weather_data, location_name, lat, lon):
+        self.location.set_text(f"Location: {location_name}")
+        self.coordinates.set_text(f"Coordinates: {lat:.4f}°N, {lon:.4f}°E")
+        self.processed.set_text(f"Data processed: {len(weather_data)} days")
+        return self.figure
+
+class PdfReportRenderer:
+    """Renders report PDFs from page templates that are built once per thread.
+
+    Figures, axes, artists and the tight layout are created on first use
+    and afterwards only have their data and titles swapped, so no pyplot
+    global state is touched and concurrent threads never share a figure.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _templates(self):
+        if not hasattr(self._local, 'pages'):
+            self._local.pages = OrderedDict()
+        return self._local.pages
+
+    def _page(self, key, factory):
+        # Keys include request-defined rule labels, so keep only the most recently used templates.
+        pages = self._templates()
+        if key in pages:
+            pages.move_to_end(key)
+        else:
+            pages[key] = factory()
+            while len(pages) > PERFORMANCE_CONFIG['PDF_TEMPLATE_CACHE_SIZE']:
+                pages.popitem(last=False)
+        return pages[key]
+
+    def _save(self, pdf, page):
+        if not page.laid_out:
+            page.figure.tight_layout()
+            # tight_layout leaves a placeholder engine that costs a dry-run draw on every save.
+            page.figure.set_layout_engine(None)
+            page.laid_out = True
+        pdf.savefig(page.figure, dpi=PERFORMANCE_CONFIG['PDF_DPI'])
+
+    def render(self, weather_data, summary, monthly_lost_days, location_name, lat, lon, unit='Days'):
+        pdf_buffer = io.BytesIO()
+        with PdfPages(pdf_buffer) as pdf:
+            page = self._page('temperature', TemperaturePage)
+            page.render(weather_data, location_name)
+            self._save(pdf, page)
+
+            if len(summary.columns):
+                columns = tuple(summary.columns)
+                page = self._page(('summary', columns), lambda: MonthlySummaryPage(columns))
+                page.render(summary, location_name)
+                self._save(pdf, page)
+
+            if len(monthly_lost_days.columns):
+                columns = tuple(monthly_lost_days.columns)
+                page = self._page(('lost_days', columns), lambda: LostDaysPage(columns))
+                page.render(monthly_lost_days, location_name, unit)
+                self._save(pdf, page)
+
+            page = self._page('location', LocationPage)
+            page.render(weather_data, location_name, lat, lon)
+            self._save(pdf, page)
+
+        return pdf_buffer.getvalue()
+
+pdf_renderer = PdfReportRenderer()
+
+def render_comparison_pdf(annual_days):
+    """One heatmap page of average days per year, sites by threshold."""
+    figure = new_figure((max(10, 0.6 * len(annual_days.columns) + 4), max(4, 0.4 * len(annual_days) + 3)))
+    ax = figure.add_subplot()
+    values = annual_days.to_numpy(dtype=float)
+    image = ax.imshow(values, aspect='auto', cmap='YlOrRd')
+    ax.set_xticks(np.arange(len(annual_days.columns)), annual_days.columns, rotation=60, ha='right', fontsize=8)
+    ax.set_yticks(np.arange(len(annual_days.index)), annual_days.index, fontsize=8)
+    for (row, column), value in np.ndenumerate(values):
+        ax.text(column, row, f"{value:.0f}", ha='center', va='center', fontsize=7)
+    figure.colorbar(image, ax=ax, label="Average Days per Year")
+    ax.set_title("Threshold Days by Site")
+    figure.tight_layout()
+
+    pdf_buffer = io.BytesIO()
+    with PdfPages(pdf_buffer) as pdf:
+        pdf.savefig(figure, dpi=PERFORMANCE_CONFIG['PDF_DPI'])
+    return pdf_buffer.getvalue()
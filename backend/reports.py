@@ -0,0 +1,232 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import pandas as pd
+from constants import PERFORMANCE_CONFIG, FILE_CONFIG
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# xlsxwriter and rendering (matplotlib) are imported on first use, so processes
+# that never build a report do not pay for them at startup.
+RENDER_MODULES = ['xlsxwriter', 'rendering']
+
+def report_cache_key(station_id, start_date, end_date, fmt, location_name, rules_fingerprint):
+    """Content address of one report artifact.
+
+    The location label is included because it is printed in the PDF and
+    used for the download file name.
+    """
+    key = [station_id, start_date.date().isoformat(), end_date.date().isoformat(), rules_fingerprint, fmt, location_name]
+    return hashlib.sha256(json.dumps(key).encode('utf-8')).hexdigest()[:32]
+
+INVALID_SHEET_CHARS = re.compile(r'[\[\]:*?/\\]')
+
+def write_frame(worksheet, frame, header_format, date_format, first_row=0):
+    """Write frame row by row in chunks, as constant_memory worksheets require.
+
+    Returns the first row after the table.
+    """
+    worksheet.write(first_row, 0, frame.index.name, header_format)
+    worksheet.write_row(first_row, 1, [str(column) for column in frame.columns], header_format)
+
+    dates = isinstance(frame.index, pd.DatetimeIndex)
+    chunk_rows = PERFORMANCE_CONFIG['EXCEL_CHUNK_ROWS']
+    for start in range(0, len(frame), chunk_rows):
+        block = frame.iloc[start:start + chunk_rows]
+        labels = block.index.to_pydatetime() if dates else block.index.tolist()
+        rows = block.astype(object).where(block.notna(), None).to_numpy().tolist()
+        for row, (label, values) in enumerate(zip(labels, rows), start=first_row + start + 1):
+            if dates:
+                worksheet.write_datetime(row, 0, label, date_format)
+            else:
+                worksheet.write(row, 0, label, header_format)
+            worksheet.write_row(row, 1, values)
+    return first_row + len(frame) + 1
+
+def new_workbook():
+    import xlsxwriter
+
+    fd, path = tempfile.mkstemp(suffix=FILE_CONFIG['EXCEL_EXTENSION'])
+    os.close(fd)
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    date_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
+    return path, workbook, header_format, date_format
+
+def sheet_names(names):
+    """Excel-safe, unique worksheet names (31 chars, no []:*?/\\)."""
+    used = set()
+    result = []
+    for name in names:
+        base = INVALID_SHEET_CHARS.sub('', name).strip() or 'Site'
+        candidate = base[:31]
+        suffix = 2
+        while candidate.lower() in used:
+            tag = f' ({suffix})'
+            candidate = base[:31 - len(tag)] + tag
+            suffix += 1
+        used.add(candidate.lower())
+        result.append(candidate)
+    return result
+
+def build_excel_report(weather_data, summary, monthly_lost_days):
+    """Stream the workbook to a temp file and return its path."""
+    path, workbook, header_format, date_format = new_workbook()
+    try:
+        write_frame(workbook.add_worksheet("Raw Data"), weather_data, header_format, date_format)
+        write_frame(workbook.add_worksheet("Monthly Summary"), summary, header_format, date_format)
+        write_frame(workbook.add_worksheet("Lost Days Summary"), monthly_lost_days, header_format, date_format)
+    finally:
+        workbook.close()
+    return path
+
+def build_batch_excel_report(sites, station_summaries):
+    """One overview sheet plus a sheet per resolved site with both summary tables."""
+    path, workbook, header_format, date_format = new_workbook()
+    try:
+        overview = pd.DataFrame(
+            [[site.get('lat'), site.get('lon'), site.get('station_id'), site.get('error')] for site in sites],
+            index=pd.Index([site['name'] for site in sites], name='Site'),
+            columns=['Latitude', 'Longitude', 'Station', 'Error']
+        )
+        write_frame(workbook.add_worksheet("Sites"), overview, header_format, date_format)
+
+        resolved = [site for site in sites if site['station_id'] in station_summaries]
+        for site, name in zip(resolved, sheet_names(site['name'] for site in resolved)):
+            summary, monthly_lost_days = station_summaries[site['station_id']]
+            worksheet = workbook.add_worksheet(name)
+            worksheet.write(0, 0, "Monthly Summary", header_format)
+            row = write_frame(worksheet, summary, header_format, date_format, first_row=1)
+            worksheet.write(row + 1, 0, "Lost Days Summary", header_format)
+            write_frame(worksheet, monthly_lost_days, header_format, date_format, first_row=row + 2)
+    finally:
+        workbook.close()
+    return path
+
+def build_pdf_report(weather_data, summary, monthly_lost_days, location_name, lat, lon, unit='Days'):
+    from rendering import pdf_renderer
+    return pdf_renderer.render(weather_data, summary, monthly_lost_days, location_name, lat, lon, unit)
+
+def build_batch_pdf_report(sites, station_summaries):
+    from rendering import render_comparison_pdf
+
+    annual_days = pd.DataFrame({
+        site['name']: pd.concat([summary.sum(), monthly_lost_days.sum()])
+        for site in sites if site['station_id'] in station_summaries
+        for summary, monthly_lost_days in [station_summaries[site['station_id']]]
+    }).T
+    return render_comparison_pdf(annual_days)
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+def render_pool():
+    global _render_pool
+    if _render_pool is None:
+        with _render_pool_lock:
+            if _render_pool is None:
+                # Not fork: the server process runs request and job threads. A fork
+                # server imports the render modules once and forks warm workers from it.
+                if 'forkserver' in multiprocessing.get_all_start_methods():
+                    context = multiprocessing.get_context('forkserver')
+                    context.set_forkserver_preload(['reports'] + RENDER_MODULES)
+                else:
+                    context = multiprocessing.get_context('spawn')
+                _render_pool = ProcessPoolExecutor(max_workers=PERFORMANCE_CONFIG['RENDER_PROCESSES'], mp_context=context)
+    return _render_pool
+
+def discard_render_pool(pool):
+    """Drop a pool whose worker died, so the next render_pool() call starts a new one."""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is pool:
+            _render_pool = None
+    pool.shutdown(wait=False)
+
+def render_reports(weather_data, summary, monthly_lost_days, location_name, lat, lon, formats, unit='Days'):
+    """Build the requested report formats in parallel.
+
+    unit names what the summaries count ("Days", or "Hours" for hourly reports).
+    Returns {format: artifact}: PDF bytes, and the path of the Excel file.
+    """
+    calls = {}
+    if 'excel' in formats:
+        calls['excel'] = (build_excel_report, weather_data, summary, monthly_lost_days)
+    if 'pdf' in formats:
+        calls['pdf'] = (build_pdf_report, weather_data, summary, monthly_lost_days, location_name, lat, lon, unit)
+    return run_render_calls(calls)
+
+def render_batch_reports(sites, station_summaries, formats):
+    calls = {}
+    if 'excel' in formats:
+        calls['excel'] = (build_batch_excel_report, sites, station_summaries)
+    if 'pdf' in formats:
+        calls['pdf'] = (build_batch_pdf_report, sites, station_summaries)
+    return run_render_calls(calls)
+
+def discard_artifacts(artifacts):
+    """Delete the Excel temp files among artifacts that will never be stored."""
+    for artifact in artifacts:
+        if isinstance(artifact, str):
+            try:
+                os.remove(artifact)
+            except OSError:
+                pass
+
+def run_render_calls(calls):
+    """Run {format: (builder, *args)} in the render pool and collect {format: result}.
+
+    Each format is timed as a pipeline stage named after it, from submission
+    to completion, since the formats render side by side. If any format
+    fails, the files already built for the others are deleted. A pool
+    broken by a dying worker is replaced and the calls are retried once.
+    """
+    if PERFORMANCE_CONFIG['RENDER_PROCESSES'] <= 0:
+        results = {}
+        try:
+            for fmt, (builder, *args) in calls.items():
+                with metrics.stage(fmt):
+                    results[fmt] = builder(*args)
+        except Exception:
+            discard_artifacts(results.values())
+            raise
+        return results
+
+    pool = render_pool()
+    try:
+        return run_pooled_calls(pool, calls)
+    except BrokenProcessPool:
+        logger.warning("Render pool broken, starting a new one")
+        discard_render_pool(pool)
+        return run_pooled_calls(render_pool(), calls)
+
+def run_pooled_calls(pool, calls):
+    start = time.perf_counter()
+    futures = {fmt: pool.submit(*call) for fmt, call in calls.items()}
+    finished = {}
+    for fmt, future in futures.items():
+        future.add_done_callback(lambda _, fmt=fmt: finished.setdefault(fmt, time.perf_counter()))
+
+    results = {}
+    error = None
+    for fmt, future in futures.items():
+        try:
+            results[fmt] = future.result()
+        except Exception as e:
+            metrics.record_stage(fmt, finished.get(fmt, time.perf_counter()) - start, type(e).__name__)
+            error = error or e
+            continue
+        metrics.record_stage(fmt, finished.get(fmt, time.perf_counter()) - start)
+    if error is not None:
+        discard_artifacts(results.values())
+        raise error
+    return results
@@ -0,0 +1,199 @@
+import ast
+import hashlib
+import operator
+import re
+from collections import namedtuple
+from functools import lru_cache, reduce
+import numpy as np
+from constants import RULES_CONFIG, ERROR_MESSAGES
+from daily_cache import DAILY_COLUMNS
+from hourly import HOURLY_COLUMNS
+
+MONTHLY_SUMMARY = 'Monthly Summary'
+LOST_DAYS_SUMMARY = 'Lost Days Summary'
+
+SHEETS = {
+    'monthly_summary': MONTHLY_SUMMARY,
+    'lost_days': LOST_DAYS_SUMMARY
+}
+
+COMPARATORS = {
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne
+}
+
+# Comparisons written as `value op column` are flipped to `column op' value`.
+MIRRORED = {ast.Gt: ast.Lt, ast.GtE: ast.LtE, ast.Lt: ast.Gt, ast.LtE: ast.GtE, ast.Eq: ast.Eq, ast.NotEq: ast.NotEq}
+
+# Columns derived from the timestamp rather than read from the series.
+DERIVED_COLUMNS = {
+    'hour': lambda index: index.hour,
+    'weekday': lambda index: index.weekday
+}
+
+# Readable columns, request key for run lengths and run step per resolution.
+RESOLUTIONS = {
+    'daily': (DAILY_COLUMNS + ['weekday'], 'consecutive_days', 'datetime64[D]'),
+    'hourly': (HOURLY_COLUMNS + ['hour', 'weekday'], 'consecutive_hours', 'datetime64[h]')
+}
+
+KEYWORDS = re.compile(r'\b(AND|OR|NOT)\b', re.IGNORECASE)
+
+Rule = namedtuple('Rule', ['sheet', 'label', 'expression', 'min_run'])
+
+def invalid_rule(label, reason):
+    return ValueError(ERROR_MESSAGES['VALIDATION']['INVALID_RULE'].format(label, reason))
+
+def number(node):
+    """The value of a numeric literal node, with an optional leading sign, or None."""
+    sign = 1.0
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        sign = -1.0 if isinstance(node.op, ast.USub) else 1.0
+        node = node.operand
+    if not isinstance(node, ast.Constant) or isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+        return None
+    return sign * float(node.value)
+
+def compile_expression(rule, allowed_columns):
+    """Compile a rule expression into (fn(columns) -> bool array, referenced columns).
+
+    Expressions are comparisons of a column with a number, e.g.
+    "tmax > 35" or "tmin < -5", combined with and/or/not and parentheses.
+    """
+    try:
+        tree = ast.parse(KEYWORDS.sub(lambda m: m.group(1).lower(), rule.expression), mode='eval')
+    except SyntaxError:
+        raise invalid_rule(rule.label, 'syntax error')
+
+    columns = set()
+
+    def compile_node(node):
+        if isinstance(node, ast.BoolOp):
+            parts = [compile_node(value) for value in node.values]
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            return lambda values: reduce(combine, (part(values) for part in parts))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            inner = compile_node(node.operand)
+            return lambda values: ~inner(values)
+        if isinstance(node, ast.Compare) and len(node.ops) == 1:
+            left, op, right = node.left, type(node.ops[0]), node.comparators[0]
+            if isinstance(right, ast.Name) and not isinstance(left, ast.Name):
+                left, op, right = right, MIRRORED[op], left
+            limit = number(right)
+            if not isinstance(left, ast.Name) or limit is None:
+                raise invalid_rule(rule.label, 'comparisons must be between a column and a number')
+            if left.id not in allowed_columns:
+                raise invalid_rule(rule.label, f"unknown column '{left.id}'")
+            column, compare = left.id, COMPARATORS[op]
+            columns.add(column)
+            return lambda values: compare(values[column], limit)
+        raise invalid_rule(rule.label, 'only comparisons, and, or, not and parentheses are allowed')
+
+    return compile_node(tree.body), frozenset(columns)
+
+def run_mask(mask, step_numbers, min_length):
+    """Keep only rows belonging to a run of at least min_length consecutive matching steps."""
+    if min_length <= 1 or not len(mask):
+        return mask
+    continues = np.zeros(len(mask), dtype=bool)
+    continues[1:] = mask[:-1] & (np.diff(step_numbers) == 1)
+    run_ids = np.cumsum(mask & ~continues)
+    lengths = np.bincount(run_ids, weights=mask)
+    return mask & (lengths[run_ids] >= min_length)
+
+class RuleSet:
+    """A compiled, immutable set of threshold rules.
+
+    Every referenced column is converted once per evaluation and each
+    rule is a tree of vectorized NumPy comparisons, so a call costs one
+    pass over the data regardless of where the rules came from.
+    """
+
+    def __init__(self, rules, resolution='daily'):
+        allowed_columns, _, self._step = RESOLUTIONS[resolution]
+        self.rules = tuple(rules)
+        self.resolution = resolution
+        self.labels = [rule.label for rule in self.rules]
+        self.sheets = [rule.sheet for rule in self.rules]
+        self.fingerprint = hashlib.sha1(repr((resolution, self.rules)).encode('utf-8')).hexdigest()[:16]
+        self._programs = [compile_expression(rule, allowed_columns) for rule in self.rules]
+        self.columns = sorted(set().union(*(columns for _, columns in self._programs)))
+        # Columns every rule reads: without one of them, no rule observes a single row.
+        self.required_columns = sorted(frozenset.intersection(*(columns for _, columns in self._programs))) if self.rules else []
+        self.max_run = max((rule.min_run for rule in self.rules), default=1)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def evaluate(self, weather_data):
+        """Return (matches, observed), both (n_rows, n_rules) boolean matrices.
+
+        A row is observed for a rule when every column the rule reads is present.
+        """
+        n_rows = len(weather_data)
+        values = {}
+        for column in self.columns:
+            if column in DERIVED_COLUMNS:
+                values[column] = np.asarray(DERIVED_COLUMNS[column](weather_data.index), dtype=float)
+            elif column in weather_data.columns:
+                values[column] = weather_data[column].to_numpy(dtype=float, na_value=np.nan)
+            else:
+                values[column] = np.full(n_rows, np.nan)
+        present = {column: ~np.isnan(array) for column, array in values.items()}
+        step_numbers = None
+
+        matches = np.zeros((n_rows, len(self.rules)), dtype=bool)
+        observed = np.ones((n_rows, len(self.rules)), dtype=bool)
+        for j, (rule, (program, columns)) in enumerate(zip(self.rules, self._programs)):
+            for column in columns:
+                observed[:, j] &= present[column]
+            mask = program(values) & observed[:, j]
+            if rule.min_run > 1:
+                if step_numbers is None:
+                    step_numbers = weather_data.index.values.astype(self._step).astype(np.int64)
+                mask = run_mask(mask, step_numbers, rule.min_run)
+            matches[:, j] = mask
+        return matches, observed
+
+@lru_cache(maxsize=RULES_CONFIG['CACHE_SIZE'])
+def compile_rules(rules, resolution='daily'):
+    """Compile a tuple of Rule, reusing the compiled set for repeated requests."""
+    return RuleSet(rules, resolution)
+
+def parse_rules(spec, resolution='daily'):
+    """Validate a request's rule list and return its compiled RuleSet.
+
+    Each entry is {label, expression, sheet?, consecutive_days?} (or
+    consecutive_hours? for hourly rules); sheet is "lost_days" (default)
+    or "monthly_summary".
+    """
+    run_key = RESOLUTIONS[resolution][1]
+    if not isinstance(spec, list) or not spec:
+        raise ValueError(ERROR_MESSAGES['VALIDATION']['INVALID_RULES'])
+    if len(spec) > RULES_CONFIG['MAX_RULES']:
+        raise ValueError(ERROR_MESSAGES['VALIDATION']['TOO_MANY_RULES'].format(RULES_CONFIG['MAX_RULES']))
+
+    rules = []
+    labels = set()
+    for entry in spec:
+        if not isinstance(entry, dict):
+            raise ValueError(ERROR_MESSAGES['VALIDATION']['INVALID_RULES'])
+        label = entry.get('label')
+        expression = entry.get('expression')
+        if not isinstance(label, str) or not label.strip() or label in labels:
+            raise invalid_rule(label, 'each rule needs a unique label')
+        if not isinstance(expression, str) or len(expression) > RULES_CONFIG['MAX_EXPRESSION_LENGTH']:
+            raise invalid_rule(label, 'missing or overlong expression')
+        sheet = SHEETS.get(entry.get('sheet', 'lost_days'))
+        if sheet is None:
+            raise invalid_rule(label, f"sheet must be one of: {', '.join(SHEETS)}")
+        min_run = entry.get(run_key, 1)
+        if not isinstance(min_run, int) or not 1 <= min_run <= RULES_CONFIG['MAX_RUN_LENGTH']:
+            raise invalid_rule(label, f"{run_key} must be between 1 and {RULES_CONFIG['MAX_RUN_LENGTH']}")
+        labels.add(label)
+        rules.append(Rule(sheet, label, ' '.join(expression.split()), min_run))
+    return compile_rules(tuple(rules), resolution)
@@ -0,0 +1,219 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from meteostat import Stations
+from constants import CACHE_CONFIG
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), CACHE_CONFIG['STATION_INDEX_FILE'])
+
+EARTH_RADIUS_M = 6371000.0
+
+def fetch_inventory():
+    with metrics.upstream('meteostat', 'stations'):
+        return Stations().fetch()
+
+def to_unit_vectors(lat, lon):
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+class StationSnapshot:
+    """Immutable arrays for one version of the station inventory."""
+
+    def __init__(self, ids, latitude, longitude, daily_start, daily_end, timezone=None):
+        self.ids = np.asarray(ids, dtype=str)
+        self.timezone = np.asarray(['UTC'] * len(self.ids) if timezone is None else timezone, dtype=str)
+        self.positions = {station_id: i for i, station_id in enumerate(self.ids.tolist())}
+        self.latitude = np.asarray(latitude, dtype=float)
+        self.longitude = np.asarray(longitude, dtype=float)
+        self.daily_start = np.asarray(daily_start, dtype='datetime64[D]')
+        self.daily_end = np.asarray(daily_end, dtype='datetime64[D]')
+        self.points = to_unit_vectors(self.latitude, self.longitude)
+        self.fingerprint = hashlib.sha1(
+            self.ids.tobytes() + self.daily_start.tobytes() + self.daily_end.tobytes()
+        ).hexdigest()
+
+    @classmethod
+    def from_inventory(cls, inventory):
+        inventory = inventory.dropna(subset=['latitude', 'longitude'])
+        timezone = inventory['timezone'].fillna('UTC').to_numpy(dtype=str) if 'timezone' in inventory else None
+        return cls(
+            inventory.index.to_numpy(dtype=str),
+            inventory['latitude'].to_numpy(),
+            inventory['longitude'].to_numpy(),
+            pd.to_datetime(inventory['daily_start']).to_numpy(dtype='datetime64[D]'),
+            pd.to_datetime(inventory['daily_end']).to_numpy(dtype='datetime64[D]'),
+            timezone
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls(arrays['ids'], arrays['latitude'], arrays['longitude'], arrays['daily_start'], arrays['daily_end'],
+                       arrays['timezone'])
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f, ids=self.ids, latitude=self.latitude, longitude=self.longitude,
+                daily_start=self.daily_start, daily_end=self.daily_end, timezone=self.timezone
+            )
+        os.replace(tmp_path, path)
+
+class StationIndex:
+    """Nearest-station lookups against an inventory loaded once and refreshed in the background.
+
+    Distances come from a single vectorized dot product against precomputed
+    unit vectors, so a lookup never re-reads or re-sorts the inventory.
+    """
+
+    def __init__(self, index_file=INDEX_FILE, refresh_hours=CACHE_CONFIG['STATION_INDEX_REFRESH_HOURS']):
+        self.index_file = index_file
+        self.refresh_seconds = refresh_hours * 3600
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._lacking = {}
+        self._lacking_lock = threading.Lock()
+        self._thread = None
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # Threads do not survive a fork; a forked worker restarts its own refresher.
+        self._lock = threading.Lock()
+        self._lacking_lock = threading.Lock()
+        if self._thread is not None:
+            self._thread = None
+            self.start()
+
+    def snapshot(self):
+        if self._snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = self._load_or_build()
+        return self._snapshot
+
+    def _load_or_build(self):
+        if os.path.exists(self.index_file) and time.time() - os.path.getmtime(self.index_file) < self.refresh_seconds:
+            try:
+                return StationSnapshot.load(self.index_file)
+            except (OSError, ValueError, KeyError):
+                logger.warning("Discarding unreadable station index %s", self.index_file)
+        snapshot = StationSnapshot.from_inventory(fetch_inventory())
+        snapshot.save(self.index_file)
+        return snapshot
+
+    def refresh(self):
+        snapshot = StationSnapshot.from_inventory(fetch_inventory())
+        if self._snapshot is None or snapshot.fingerprint != self._snapshot.fingerprint:
+            snapshot.save(self.index_file)
+            self._snapshot = snapshot
+            # Changed coverage may mean stations gained sensors or backfilled data.
+            with self._lacking_lock:
+                self._lacking = {}
+        else:
+            os.utime(self.index_file)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        try:
+            self.snapshot()
+        except Exception:
+            logger.exception("Station index warm-up failed")
+        while True:
+            time.sleep(self.refresh_seconds)
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Station index refresh failed")
+
+    def record_parameters(self, station_id, data, min_days=CACHE_CONFIG['PARAMETER_EVIDENCE_DAYS']):
+        """Remember the date spans over which a station reported no values for a daily parameter.
+
+        A span counts only when it has at least min_days rows, so one short
+        gap is not evidence; values reported later clear the spans they overlap.
+        """
+        if data.empty:
+            return
+        with self._lacking_lock:
+            for column in data.columns:
+                spans = self._lacking.setdefault(column, {})
+                first, last = data[column].first_valid_index(), data[column].last_valid_index()
+                if first is not None:
+                    kept = [(start, end) for start, end in spans.get(station_id, ()) if end < first or start > last]
+                elif len(data) >= min_days:
+                    start, end = data.index[0], data.index[-1]
+                    kept = []
+                    for span_start, span_end in spans.get(station_id, ()):
+                        if span_end < start or span_start > end:
+                            kept.append((span_start, span_end))
+                        else:
+                            start, end = min(start, span_start), max(end, span_end)
+                    kept.append((start, end))
+                else:
+                    continue
+                if kept:
+                    spans[station_id] = kept
+                else:
+                    spans.pop(station_id, None)
+
+    def lacking(self, parameters, start=None, end=None):
+        """Stations seen reporting nothing for one of parameters over part of [start, end]."""
+        start = pd.Timestamp.min if start is None else pd.Timestamp(start)
+        end = pd.Timestamp.max if end is None else pd.Timestamp(end)
+        with self._lacking_lock:
+            return {
+                station_id
+                for parameter in parameters
+                for station_id, spans in self._lacking.get(parameter, {}).items()
+                if any(span_start <= end and span_end >= start for span_start, span_end in spans)
+            }
+
+    def timezone(self, station_id):
+        """The station's IANA time zone from the inventory, UTC if unknown."""
+        snapshot = self.snapshot()
+        position = snapshot.positions.get(str(station_id))
+        return 'UTC' if position is None else str(snapshot.timezone[position])
+
+    def nearest(self, lat, lon, k=1, start=None, end=None, require=()):
+        """Return up to k (station_id, distance_m) pairs, closest first.
+
+        start/end keep only stations whose daily inventory overlaps the range;
+        require drops stations already seen returning no data for a parameter
+        somewhere in that range.
+        """
+        snapshot = self.snapshot()
+        mask = np.ones(len(snapshot.ids), dtype=bool)
+        if start is not None and end is not None:
+            mask &= snapshot.daily_start <= np.datetime64(pd.Timestamp(end).date())
+            mask &= snapshot.daily_end >= np.datetime64(pd.Timestamp(start).date())
+        lacking = self.lacking(require, start, end) if require else set()
+        if lacking:
+            mask &= ~np.isin(snapshot.ids, list(lacking))
+
+        candidates = np.flatnonzero(mask)
+        if len(candidates) == 0:
+            return []
+
+        similarity = snapshot.points[candidates] @ to_unit_vectors([lat], [lon])[0]
+        k = min(k, len(candidates))
+        top = np.argpartition(-similarity, k - 1)[:k]
+        top = top[np.argsort(-similarity[top])]
+
+        chord = np.sqrt(np.clip(2.0 - 2.0 * similarity[top], 0.0, 4.0))
+        distances = 2.0 * EARTH_RADIUS_M * np.arcsin(chord / 2.0)
+        return list(zip(snapshot.ids[candidates[top]].tolist(), distances.tolist()))
+
+station_index = StationIndex()
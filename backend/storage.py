@@ -0,0 +1,153 @@
+import heapq
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from constants import API_CONFIG, CACHE_CONFIG
+
+class StoredFile:
+    __slots__ = ('data', 'path', 'size', 'metadata', 'expires')
+
+    def __init__(self, data, path, size, metadata, expires):
+        self.data = data
+        self.path = path
+        self.size = size
+        self.metadata = metadata
+        self.expires = expires
+
+class FileStorage:
+    """Thread-safe report store with one expiry sweeper and a memory budget.
+
+    Artifacts are kept in LRU order. Once the in-memory bytes exceed
+    memory_budget, the least recently used ones are spilled to spill_dir;
+    once the total exceeds max_bytes, the least recently used are dropped.
+    """
+
+    def __init__(self, max_bytes=CACHE_CONFIG['REPORT_CACHE_MAX_BYTES'],
+                 memory_budget=CACHE_CONFIG['REPORT_MEMORY_BUDGET_BYTES'],
+                 keep_after_download=CACHE_CONFIG['KEEP_REPORTS_AFTER_DOWNLOAD'],
+                 spill_dir=CACHE_CONFIG['REPORT_SPILL_DIR']):
+        self.max_bytes = max_bytes
+        self.memory_budget = memory_budget
+        self.keep_after_download = keep_after_download
+        self.spill_dir = spill_dir or os.path.join(tempfile.gettempdir(), f'weather-reports-{os.getpid()}')
+        self.files = OrderedDict()
+        self.total_bytes = 0
+        self.memory_bytes = 0
+        self._expiry_heap = []
+        self._start_sweeper()
+        os.register_at_fork(after_in_child=self._start_sweeper)
+
+    def _start_sweeper(self):
+        # Also run in forked workers, which inherit the store but not its thread.
+        self._lock = threading.Condition()
+        self._sweeper = threading.Thread(target=self._sweep, daemon=True)
+        self._sweeper.start()
+
+    def store(self, data, file_type, location_name=None, file_id=None, ttl_seconds=API_CONFIG['FILE_EXPIRY_SECONDS']):
+        file_id = file_id or str(uuid.uuid4())
+        metadata = {'file_type': file_type, 'location_name': location_name}
+        return self._add(file_id, StoredFile(data, None, len(data), metadata, time.time() + ttl_seconds))
+
+    def store_file(self, path, file_type, location_name=None, file_id=None, ttl_seconds=API_CONFIG['FILE_EXPIRY_SECONDS']):
+        """Take ownership of a file on disk without reading it into memory."""
+        file_id = file_id or str(uuid.uuid4())
+        os.makedirs(self.spill_dir, exist_ok=True)
+        stored_path = os.path.join(self.spill_dir, f'{file_id}.{uuid.uuid4().hex}.bin')
+        shutil.move(path, stored_path)
+        metadata = {'file_type': file_type, 'location_name': location_name}
+        size = os.path.getsize(stored_path)
+        return self._add(file_id, StoredFile(None, stored_path, size, metadata, time.time() + ttl_seconds))
+
+    def _add(self, file_id, entry):
+        with self._lock:
+            self._remove(file_id)
+            self.files[file_id] = entry
+            self.total_bytes += entry.size
+            if entry.data is not None:
+                self.memory_bytes += entry.size
+            heapq.heappush(self._expiry_heap, (entry.expires, file_id))
+            self._enforce_budgets()
+            self._lock.notify()
+        return file_id
+
+    def contains(self, file_id):
+        """Whether a live file is stored; a hit counts as a use for LRU eviction."""
+        with self._lock:
+            entry = self.files.get(file_id)
+            if entry is None or time.time() >= entry.expires:
+                return False
+            self.files.move_to_end(file_id)
+            return True
+
+    def open(self, file_id):
+        """Return (readable stream, metadata) for a stored file, or (None, None).
+
+        The stream is opened under the lock, so a concurrent eviction or
+        removal can unlink the file without breaking a download in progress.
+        """
+        with self._lock:
+            entry = self.files.get(file_id)
+            if entry is None or time.time() >= entry.expires:
+                return None, None
+            if entry.data is not None:
+                stream = io.BytesIO(entry.data)
+            else:
+                stream = open(entry.path, 'rb')
+            if self.keep_after_download:
+                self.files.move_to_end(file_id)
+            else:
+                self._remove(file_id)
+            return stream, entry.metadata
+
+    def remove(self, file_id):
+        with self._lock:
+            self._remove(file_id)
+
+    def _remove(self, file_id):
+        entry = self.files.pop(file_id, None)
+        if entry is None:
+            return
+        self.total_bytes -= entry.size
+        if entry.data is not None:
+            self.memory_bytes -= entry.size
+        if entry.path is not None:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _enforce_budgets(self):
+        while self.total_bytes > self.max_bytes and len(self.files) > 1:
+            self._remove(next(iter(self.files)))
+
+        if self.memory_bytes <= self.memory_budget:
+            return
+        os.makedirs(self.spill_dir, exist_ok=True)
+        for file_id, entry in self.files.items():
+            if self.memory_bytes <= self.memory_budget:
+                break
+            if entry.data is None:
+                continue
+            entry.path = os.path.join(self.spill_dir, f'{file_id}.{uuid.uuid4().hex}.bin')
+            with open(entry.path, 'wb') as f:
+                f.write(entry.data)
+            entry.data = None
+            self.memory_bytes -= entry.size
+
+    def _sweep(self):
+        with self._lock:
+            while True:
+                now = time.time()
+                while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                    expires, file_id = heapq.heappop(self._expiry_heap)
+                    entry = self.files.get(file_id)
+                    # Re-stored IDs leave stale heap items behind; only act on the current expiry.
+                    if entry is not None and entry.expires == expires:
+                        self._remove(file_id)
+                timeout = self._expiry_heap[0][0] - now if self._expiry_heap else None
+                self._lock.wait(timeout)
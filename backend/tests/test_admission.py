@@ -0,0 +1,100 @@
+"""Admission control for a request and a job asking for the same report, offline against the benchmark fixtures.
+
+Run from backend/:
+    python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'benchmarks'))
+
+from constants import ADMISSION_CONFIG, PERFORMANCE_CONFIG
+from fixtures import install, isolate, load_fixtures
+
+CACHE_DIR = tempfile.mkdtemp()
+isolate(CACHE_DIR)
+import app
+
+MAX_WAIT_SECONDS = 1
+REPORT = {'location': 'London, UK', 'startDate': '01-01-2019', 'endDate': '31-12-2019', 'formats': ['pdf']}
+
+def setUpModule():
+    install(load_fixtures(), CACHE_DIR)
+
+def wait_for(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError(f"condition not met within {timeout}s")
+        time.sleep(0.05)
+
+def queued_runs():
+    return sum(app.admission_controller.queued(name) for name in ADMISSION_CONFIG['COST_CLASSES'])
+
+class SameReportTest(unittest.TestCase):
+    def setUp(self):
+        for patcher in (
+            mock.patch.dict(ADMISSION_CONFIG, {'MAX_WAIT_SECONDS': MAX_WAIT_SECONDS}),
+            mock.patch.dict(PERFORMANCE_CONFIG, {'RENDER_PROCESSES': 0})
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        self.hold_all_slots()
+        self.client = app.app.test_client()
+
+    def hold_all_slots(self):
+        """Fill every slot with runs that last until self.release is set, cheapest classes first."""
+        held = threading.Semaphore(0)
+
+        def hold(cost):
+            app.admission_controller.set_client('holder', wait_seconds=None)
+            with app.admission_controller.slot(cost):
+                held.release()
+                self.release.wait()
+
+        remaining = ADMISSION_CONFIG['SLOTS']
+        threads = []
+        for max_cost, max_running, _ in ADMISSION_CONFIG['COST_CLASSES'].values():
+            for _ in range(min(max_running, remaining)):
+                threads.append(threading.Thread(target=hold, args=(max_cost or 10 ** 9,), daemon=True))
+            remaining -= min(max_running, remaining)
+        for thread in threads:
+            thread.start()
+        for _ in threads:
+            self.assertTrue(held.acquire(timeout=10))
+
+    def job_status(self, job_id):
+        return self.client.get(f'/api/jobs/{job_id}').get_json()
+
+    def test_sync_request_gets_429_while_job_for_same_report_stays_queued(self):
+        job = self.client.post('/api/jobs', json=REPORT)
+        self.assertEqual(job.status_code, 202)
+        job_id = job.get_json()['job_id']
+        wait_for(lambda: queued_runs() == 1)
+
+        start = time.monotonic()
+        response = self.client.post('/api/weather-data', json=REPORT)
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response.headers['Retry-After']), 1)
+        self.assertLess(elapsed, MAX_WAIT_SECONDS + 1)
+        self.assertEqual(queued_runs(), 1)
+        self.assertEqual(self.job_status(job_id)['status'], 'running')
+        self.assertEqual(self.job_status(job_id)['stage'], 'station_lookup')
+
+        self.release.set()
+        wait_for(lambda: self.job_status(job_id)['status'] != 'running', timeout=120)
+        self.assertEqual(self.job_status(job_id)['status'], 'complete')
+
+if __name__ == '__main__':
+    unittest.main()
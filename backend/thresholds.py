@@ -0,0 +1,227 @@
+import numpy as np
+import pandas as pd
+from constants import WEATHER_THRESHOLDS, MONTH_MAPPING, HOURLY_CONFIG
+from rules import MONTHLY_SUMMARY, LOST_DAYS_SUMMARY, Rule, compile_rules
+
+def build_threshold_table(thresholds=WEATHER_THRESHOLDS):
+    """Flatten the threshold config into (sheet, label, column, op, value) rows."""
+    temp = thresholds['TEMPERATURE']
+    precip = thresholds['PRECIPITATION']
+    wind = thresholds['WIND']
+
+    return [
+        (MONTHLY_SUMMARY, f'Rain > {precip["LIGHT_RAIN"]}mm Days (Avg)', 'prcp', '>', precip['LIGHT_RAIN']),
+        (MONTHLY_SUMMARY, f'Rain > {precip["MODERATE_RAIN"]}mm Days (Avg)', 'prcp', '>', precip['MODERATE_RAIN']),
+        (MONTHLY_SUMMARY, f'Wind > {wind["EXTREME_KMH"]}km/h Days (Avg)', 'wspd', '>', wind['EXTREME_KMH']),
+        (LOST_DAYS_SUMMARY, f'Max > {temp["MAX_HIGH"]}°C', 'tmax', '>', temp['MAX_HIGH']),
+        (LOST_DAYS_SUMMARY, f'Max > {temp["MAX_MODERATE"]}°C', 'tmax', '>', temp['MAX_MODERATE']),
+        (LOST_DAYS_SUMMARY, f'Min < {temp["MIN_COLD"]}°C', 'tmin', '<', temp['MIN_COLD']),
+        (LOST_DAYS_SUMMARY, f'Min < {temp["MIN_VERY_COLD"]}°C', 'tmin', '<', temp['MIN_VERY_COLD']),
+        (LOST_DAYS_SUMMARY, f'Min < {temp["MIN_FREEZING"]}°C', 'tmin', '<', temp['MIN_FREEZING']),
+        (LOST_DAYS_SUMMARY, f'Min < {temp["MIN_EXTREME_COLD"]}°C', 'tmin', '<', temp['MIN_EXTREME_COLD']),
+        (LOST_DAYS_SUMMARY, f'Rain > {precip["HEAVY_RAIN"]}mm', 'prcp', '>', precip['HEAVY_RAIN']),
+        (LOST_DAYS_SUMMARY, f'Rain > {precip["VERY_HEAVY_RAIN"]}mm', 'prcp', '>', precip['VERY_HEAVY_RAIN']),
+        (LOST_DAYS_SUMMARY, f'Wind > {wind["MODERATE"]} m/s', 'wspd', '>', wind['MODERATE']),
+        (LOST_DAYS_SUMMARY, f'Wind > {wind["HIGH"]} m/s', 'wspd', '>', wind['HIGH']),
+        (LOST_DAYS_SUMMARY, f'Wind > {wind["VERY_HIGH"]} m/s', 'wspd', '>', wind['VERY_HIGH']),
+    ]
+
+THRESHOLD_TABLE = build_threshold_table()
+
+DEFAULT_RULES = compile_rules(tuple(
+    Rule(sheet, label, f'{column} {op} {value}', 1) for sheet, label, column, op, value in THRESHOLD_TABLE
+))
+
+def build_hourly_rules(thresholds=WEATHER_THRESHOLDS, work_hours=HOURLY_CONFIG['WORK_HOURS']):
+    """Hourly counterpart of the threshold table, counting hours instead of days."""
+    temp = thresholds['TEMPERATURE']
+    precip = thresholds['PRECIPITATION']
+    wind = thresholds['WIND']
+    first_hour, last_hour = work_hours
+
+    return compile_rules((
+        Rule(MONTHLY_SUMMARY, 'Rain Hours (Avg)', 'prcp > 0', 1),
+        Rule(MONTHLY_SUMMARY, 'Work-Hour Rain Hours (Avg)',
+             f'prcp > 0 and hour >= {first_hour} and hour < {last_hour} and weekday < 5', 1),
+        Rule(MONTHLY_SUMMARY, f'Wind > {wind["EXTREME_KMH"]}km/h Hours (Avg)', f'wspd > {wind["EXTREME_KMH"]}', 1),
+        Rule(LOST_DAYS_SUMMARY, f'Temp > {temp["MAX_HIGH"]}°C', f'temp > {temp["MAX_HIGH"]}', 1),
+        Rule(LOST_DAYS_SUMMARY, f'Temp > {temp["MAX_MODERATE"]}°C', f'temp > {temp["MAX_MODERATE"]}', 1),
+        Rule(LOST_DAYS_SUMMARY, f'Temp < {temp["MIN_COLD"]}°C', f'temp < {temp["MIN_COLD"]}', 1),
+        Rule(LOST_DAYS_SUMMARY, f'Temp < {temp["MIN_VERY_COLD"]}°C', f'temp < {temp["MIN_VERY_COLD"]}', 1),
+        Rule(LOST_DAYS_SUMMARY, f'Temp < {temp["MIN_FREEZING"]}°C', f'temp < {temp["MIN_FREEZING"]}', 1),
+        Rule(LOST_DAYS_SUMMARY, f'Temp < {temp["MIN_EXTREME_COLD"]}°C', f'temp < {temp["MIN_EXTREME_COLD"]}', 1),
+        Rule(LOST_DAYS_SUMMARY, f'Rain > {precip["LIGHT_RAIN"]}mm/h', f'prcp > {precip["LIGHT_RAIN"]}', 1),
+        Rule(LOST_DAYS_SUMMARY, f'Rain > {precip["MODERATE_RAIN"]}mm/h', f'prcp > {precip["MODERATE_RAIN"]}', 1),
+        Rule(LOST_DAYS_SUMMARY, f'Wind > {wind["MODERATE"]} m/s', f'wspd > {wind["MODERATE"]}', 1),
+        Rule(LOST_DAYS_SUMMARY, f'Wind > {wind["HIGH"]} m/s', f'wspd > {wind["HIGH"]}', 1),
+        Rule(LOST_DAYS_SUMMARY, f'Wind > {wind["VERY_HIGH"]} m/s', f'wspd > {wind["VERY_HIGH"]}', 1),
+    ), 'hourly')
+
+DEFAULT_HOURLY_RULES = build_hourly_rules()
+
+def monthly_counts(months, masks, groups=None, n_groups=1):
+    """Sum a boolean mask matrix per (group, calendar month) with a single bincount."""
+    n_thresholds = masks.shape[1]
+    cells = np.asarray(months, dtype=np.intp) - 1
+    if groups is not None:
+        cells = cells + 12 * np.asarray(groups, dtype=np.intp)
+    bins = cells[:, None] * n_thresholds + np.arange(n_thresholds)
+    counts = np.bincount(bins.ravel(), weights=masks.ravel(), minlength=n_groups * 12 * n_thresholds)
+    return counts.reshape(n_groups, 12, n_thresholds) if groups is not None else counts.reshape(12, n_thresholds)
+
+def calendar_months(start, end):
+    """(calendar days, number of distinct years) per calendar month of the inclusive range."""
+    days = pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize(), freq='D')
+    month_starts = pd.period_range(days[0], days[-1], freq='M')
+    return (
+        np.bincount(days.month - 1, minlength=12),
+        np.bincount(month_starts.month - 1, minlength=12)
+    )
+
+def summary_frames(counts, valid, rows, calendar, rules=DEFAULT_RULES):
+    """Turn (12, n_thresholds) exceedance and valid-day counts into the two summary frames.
+
+    Each value is the exceedance rate over observed days scaled to the
+    average length of that month in the range, i.e. days per year, so
+    missing observations no longer count as non-exceedances.
+    """
+    calendar_days, month_years = calendar
+    days_per_year = calendar_days / np.maximum(month_years, 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        averages = np.where(valid > 0, counts / valid, 0.0) * days_per_year[:, None]
+
+    labels = rules.labels
+    summary_columns = [j for j, sheet in enumerate(rules.sheets) if sheet == MONTHLY_SUMMARY]
+    lost_days_columns = [j for j, sheet in enumerate(rules.sheets) if sheet == LOST_DAYS_SUMMARY]
+    present = np.flatnonzero(rows)
+
+    summary = pd.DataFrame(
+        averages[np.ix_(present, summary_columns)],
+        index=pd.Index([MONTH_MAPPING[month + 1] for month in present], name='month'),
+        columns=[labels[j] for j in summary_columns]
+    )
+    monthly_lost_days = pd.DataFrame(
+        averages[:, lost_days_columns],
+        index=[MONTH_MAPPING[month] for month in range(1, 13)],
+        columns=[labels[j] for j in lost_days_columns]
+    )
+    return summary, monthly_lost_days
+
+def data_span(weather_data, start, end):
+    return (
+        weather_data.index.min() if start is None else start,
+        weather_data.index.max() if end is None else end
+    )
+
+def compute_threshold_summaries(weather_data, rules=DEFAULT_RULES, start=None, end=None):
+    """Return the (Monthly Summary, Lost Days Summary) frames from one pass over the data.
+
+    start/end give the requested range; they default to the span of the data.
+    """
+    months = weather_data['month'].to_numpy() if 'month' in weather_data.columns else weather_data.index.month
+
+    matches, observed = rules.evaluate(weather_data)
+    counts = monthly_counts(months, matches)
+    valid = monthly_counts(months, observed)
+    rows = np.bincount(np.asarray(months) - 1, minlength=12)
+    return summary_frames(counts, valid, rows, calendar_months(*data_span(weather_data, start, end)), rules)
+
+def compute_grouped_threshold_summaries(frames, rules=DEFAULT_RULES, start=None, end=None):
+    """Summaries for several series at once, e.g. one per station.
+
+    frames maps a key to a daily frame; the frames are evaluated as one
+    combined frame and counted per (key, month) in the same bincount.
+    Returns {key: (summary, monthly_lost_days)}.
+    """
+    keys = list(frames)
+    combined = pd.concat([frames[key] for key in keys])
+    groups = np.repeat(np.arange(len(keys)), [len(frames[key]) for key in keys])
+    months = combined.index.month.to_numpy()
+
+    matches, observed = rules.evaluate(combined)
+    counts = monthly_counts(months, matches, groups, len(keys))
+    valid = monthly_counts(months, observed, groups, len(keys))
+    rows = np.bincount(12 * groups + months - 1, minlength=12 * len(keys)).reshape(len(keys), 12)
+    return {
+        key: summary_frames(
+            counts[i], valid[i], rows[i],
+            calendar_months(*data_span(frames[key], start, end)),
+            rules
+        )
+        for i, key in enumerate(keys)
+    }
+
+class HourlyAggregator:
+    """Folds an hourly series, chunk by chunk, into daily aggregates and monthly rule counts.
+
+    Rows are only folded once the longest run rule has seen enough rows
+    after them, and only that many rows are carried into the next chunk,
+    so memory is bounded by the chunk size rather than the range.
+    """
+
+    def __init__(self, rules=DEFAULT_HOURLY_RULES):
+        self.rules = rules
+        self.context = rules.max_run - 1
+        self.counts = np.zeros((12, len(rules)))
+        self.valid = np.zeros((12, len(rules)))
+        self.rows = np.zeros(12, dtype=np.int64)
+        self.daily = []
+        self._carry = None
+        self._folded = 0
+
+    def add(self, chunk):
+        window = chunk if self._carry is None or self._carry.empty else pd.concat([self._carry, chunk])
+        self._fold(window, final=False)
+
+    def finish(self, start, end):
+        """Fold the remaining rows and return (daily aggregates, summary, monthly_lost_days)."""
+        if self._carry is not None:
+            self._fold(self._carry, final=True)
+        daily = pd.concat(self.daily) if self.daily else pd.DataFrame(index=pd.DatetimeIndex([], name='time'))
+        calendar_days, month_years = calendar_months(start, end)
+        summary, monthly_lost_days = summary_frames(
+            self.counts, self.valid, self.rows, (calendar_days * 24, month_years), self.rules
+        )
+        return daily, summary, monthly_lost_days
+
+    def _fold(self, window, final):
+        lo, hi = self._folded, len(window)
+        if not final and self.context:
+            # Stop at the start of the day holding the first row that still lacks look-ahead.
+            target = hi - self.context
+            days = window.index.normalize()
+            hi = max(lo, days.searchsorted(days[target])) if target > lo else lo
+
+        if hi > lo:
+            matches, observed = self.rules.evaluate(window)
+            matches, observed = matches[lo:hi], observed[lo:hi]
+            part = window.iloc[lo:hi]
+            months = part.index.month.to_numpy()
+            self.counts += monthly_counts(months, matches)
+            self.valid += monthly_counts(months, observed)
+            self.rows += np.bincount(months - 1, minlength=12)
+            self.daily.append(self._daily(part, matches))
+
+        keep_from = max(0, hi - self.context)
+        self._carry = window.iloc[keep_from:]
+        self._folded = hi - keep_from
+
+    def _daily(self, part, matches):
+        days = part.index.normalize().rename('time')
+        temp = part['temp'].groupby(days)
+        daily = pd.DataFrame({
+            'tavg': temp.mean(),
+            'tmin': temp.min(),
+            'tmax': temp.max(),
+            'prcp': part['prcp'].groupby(days).sum(min_count=1),
+            'wspd': part['wspd'].groupby(days).mean()
+        })
+        hours = pd.DataFrame(matches, index=part.index, columns=[label.replace(' (Avg)', '') for label in self.rules.labels])
+        return daily.join(hours.groupby(days).sum(), rsuffix=' (hours)')
+
+def aggregate_hourly(chunks, rules=DEFAULT_HOURLY_RULES, start=None, end=None):
+    """Stream hourly chunks through a HourlyAggregator; see HourlyAggregator.finish."""
+    aggregator = HourlyAggregator(rules)
+    for chunk in chunks:
+        aggregator.add(chunk)
+    return aggregator.finish(start, end)
@@ -1,6 +1,8 @@
 from functools import wraps
 from flask import request
 import re
+from concurrent.futures import Future
+from threading import Lock
 
 def camel_to_snake(name):
     """Convert camelCase string to snake_case."""
@@ -33,4 +35,38 @@ def normalize_request_data(f):
                 for key, value in request.args.items()
             })
         return f(*args, **kwargs)
-    return decorated_function 
\ No newline at end of file
+    return decorated_function 
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution.
+
+    Followers wait at most timeout seconds for the shared result (None
+    waits as long as it takes) and then get concurrent.futures.TimeoutError;
+    the execution itself carries on for the others.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._lock = Lock()
+
+    def do(self, key, fn, timeout=None):
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            return future.result(timeout)
+
+        try:
+            value = fn()
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)